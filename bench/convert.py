@@ -0,0 +1,134 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Compares csapi.convert with the reflective copy_to_object it replaced.
+
+Converts rows shaped like marvin's listAccounts results into Account models,
+as the list calls do, and Account models into commands, as create and
+update do. Needs neither marvin nor a management server:
+
+    PYTHONPATH=`pwd` python bench/convert.py --rows 100000
+"""
+
+import time
+from collections import Mapping
+from optparse import OptionParser
+
+from csapi.convert import new_object
+from csapi.model import Account
+
+
+def reflective_copy_to_object(obj, d, set_all=False):
+    """copy_to_object as it was before csapi.convert."""
+    mapping = d
+    if not isinstance(d, Mapping):
+        mapping = d.__dict__
+    if set_all:
+        for key, val in mapping.iteritems():
+            if not callable(val):
+                setattr(obj, key, val)
+    else:
+        for key, val in obj.__dict__.iteritems():
+            if not callable(val) and key in mapping:
+                setattr(obj, key, mapping.get(key))
+    return obj
+
+
+def reflective_new_object(constructor, d, set_all=False):
+    result = constructor()
+    reflective_copy_to_object(result, d, set_all=set_all)
+    return result
+
+
+# old-style, like marvin's generated classes
+class account:
+    def __init__(self):
+        self.id = None
+        self.name = None
+        self.accounttype = None
+        self.domainid = None
+        self.domain = None
+        self.networkdomain = None
+        self.state = None
+        self.iscleanuprequired = None
+        self.isdefault = None
+        self.receivedbytes = None
+        self.sentbytes = None
+        self.vmlimit = None
+        self.vmtotal = None
+        self.iplimit = None
+        self.iptotal = None
+        self.user = []
+
+
+class updateAccountCmd:
+    def __init__(self):
+        self.isAsync = "false"
+        self.id = None
+        self.account = None
+        self.accountdetails = []
+        self.domainid = None
+        self.networkdomain = None
+        self.newname = None
+        self.required = []
+
+
+def rows(count):
+    result = []
+    for i in xrange(count):
+        row = account()
+        row.id = 'acc-%d' % i
+        row.name = 'account%d' % i
+        row.accounttype = 0
+        row.domainid = 'dom-1'
+        row.domain = 'ROOT'
+        row.state = 'enabled'
+        row.isdefault = False
+        row.receivedbytes = i
+        row.sentbytes = i
+        row.user = [{'id': 'user-%d' % i}]
+        result.append(row)
+    return result
+
+
+def timed(convert, sources, target, set_all):
+    start = time.time()
+    for source in sources:
+        convert(target, source, set_all=set_all)
+    return time.time() - start
+
+
+def main():
+    parser = OptionParser(usage="usage: %prog [options]")
+    parser.add_option("-r", "--rows", dest="rows", type="int", default=100000,
+                      help="Number of rows to convert")
+    parser.add_option("-n", "--runs", dest="runs", type="int", default=5,
+                      help="Number of runs to take the best of")
+    (options, args) = parser.parse_args()
+
+    results = rows(options.rows)
+    models = [new_object(Account, row, set_all=True) for row in results]
+    cases = [("result -> Account", results, Account, True),
+             ("Account -> updateAccountCmd", models, updateAccountCmd, False)]
+    for name, sources, target, set_all in cases:
+        before = min([timed(reflective_new_object, sources, target, set_all) for i in xrange(options.runs)])
+        after = min([timed(new_object, sources, target, set_all) for i in xrange(options.runs)])
+        print "%-28s %8.1f ms -> %8.1f ms  (%.1fx)" % (name, before * 1000, after * 1000, before / after)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Measures how long importing csapi takes in a fresh interpreter.
+
+Every module is imported in a new python process a number of times, and the
+median time of an interpreter that imports nothing is subtracted. Exits with
+status 1 when any module takes longer than the budget, so it can guard
+against slow imports creeping back in:
+
+    PYTHONPATH=`pwd` python bench/import_time.py --budget-ms 50
+"""
+
+import os
+import sys
+import time
+import subprocess
+from optparse import OptionParser
+
+_default_modules = ['csapi.apiclient', 'csapi.account', 'csapi.domain', 'csapi.user', 'csapi.zone',
+                    'cstest.framework']
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) / 2]
+
+
+def time_import(statement, runs):
+    """Median wall clock seconds of running statement in a new interpreter.
+
+    :type statement: str
+    :type runs: int
+    :rtype: float
+    """
+    timings = []
+    for i in xrange(runs):
+        start = time.time()
+        subprocess.check_call([sys.executable, '-c', statement])
+        timings.append(time.time() - start)
+    return median(timings)
+
+
+def main():
+    parser = OptionParser(usage="usage: %prog [options] [module ...]")
+    parser.add_option("-n", "--runs", dest="runs", type="int", default=11,
+                      help="Number of imports to take the median of")
+    parser.add_option("-b", "--budget-ms", dest="budget_ms", type="float", default=50.0,
+                      help="Maximum import time of a module, in milliseconds")
+    (options, modules) = parser.parse_args()
+    if not modules:
+        modules = _default_modules
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    os.environ['PYTHONPATH'] = os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')]))
+
+    baseline = time_import('pass', options.runs)
+    print "interpreter startup: %.1f ms" % (baseline * 1000)
+    over_budget = []
+    for module in modules:
+        took = max(0.0, time_import('import %s' % module, options.runs) - baseline) * 1000
+        print "%-24s %8.1f ms" % (module, took)
+        if took > options.budget_ms:
+            over_budget.append(module)
+    if over_budget:
+        print "over the budget of %.0f ms: %s" % (options.budget_ms, ', '.join(over_budget))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
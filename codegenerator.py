@@ -269,7 +269,8 @@ class CodeGenerator(object):
     newline = '\n'
     cmdsName = []
 
-    def __init__(self, outputFolder):
+    def __init__(self, outputFolder, registry=False):
+        self.registry = registry
         self.cmd = None
         self.code = ""
         self.required = []
@@ -474,6 +475,43 @@ class CodeGenerator(object):
         fp.write(basecmd)
         fp.close()
 
+    @staticmethod
+    def registry_params(params):
+        entries = []
+        for p in params:
+            data_type = str(p.dataType or p.type)
+            required = str(p.required).lower() == "true"
+            entries.append((str(p.name), data_type, required, p.type in ["list", "map"]))
+        return tuple(entries)
+
+    @classmethod
+    def registry_fields(cls, fields):
+        entries = []
+        for p in fields:
+            data_type = str(p.dataType or p.type)
+            entries.append((str(p.name), data_type, cls.registry_fields(p.subProperties)))
+        return tuple(entries)
+
+    def generate_registry(self, cmds):
+        """Writes all commands as one table, for csapi.registry to build classes from.
+
+        :type cmds: list[CloudStackCmd]
+        """
+        code = self.license
+        code += '"""Generated table of cloudstack commands, see csapi.registry."""\n'
+        code += self.newline
+        code += 'COMMANDS = {\n'
+        for cmd in sorted(cmds, key=lambda c: c.name):
+            is_async = str(cmd.async).lower() == "true"
+            entry = (is_async, self.registry_params(cmd.request_params), self.registry_fields(cmd.response_params))
+            code += self.space + '%r: %r,\n' % (str(cmd.name), entry)
+        code += '}\n'
+
+        fp = open(self.outputFolder + '/csapi/command_table.py', 'w')
+        fp.write(code)
+        fp.close()
+        print "REGISTRY: %d commands" % len(cmds)
+
     @staticmethod
     def to_camel_case(model_name):
         s1 = _first_cap_re.sub(r'\1_\2', model_name)
@@ -586,6 +624,9 @@ class CodeGenerator(object):
         """
         :type cmds: list[CloudStackCmd]
         """
+        if self.registry:
+            self.generate_registry(cmds)
+            return
         models = self.extract_models(cmds)
             
         model_names = models.keys()
@@ -763,6 +804,9 @@ def main():
     parser.add_option("-a", "--apiserver", dest="server",
                       help="The cloudstack management server (with open 8096) where apis are discovered, "
                            "i.e. localhost")
+    parser.add_option("-r", "--registry", dest="registry", action="store_true", default=False,
+                      help="Generate a single table of all commands, csapi/command_table.py, "
+                           "instead of models and APIs")
     (options, args) = parser.parse_args()
 
     if options.output is None:
@@ -789,11 +833,11 @@ def main():
         os.mkdir(modelModule)
 
     if use_specfile:
-        cg = XmlCodeGenerator(folder)
+        cg = XmlCodeGenerator(folder, registry=options.registry)
         cg.generate_from_file(options.spec)
     else:
         endpointUrl = 'http://%s:8096/client/api?command=listApis&response=json' % options.server
-        cg = JsonCodeGenerator(folder)
+        cg = JsonCodeGenerator(folder, registry=options.registry)
         cg.generate_from_api(endpointUrl)
 
 
@@ -16,23 +16,27 @@
 # under the License.
 
 import os
-import sys
+import copy
 import logging
-import re
-import pprint
-from xml.etree import ElementTree as ET
-from collections import namedtuple, Mapping
+import hmac
+import hashlib
+import base64
+import urllib
+import threading
+import weakref
+from contextlib import contextmanager
+from functools import partial
 
-import requests
-from marvin.cloudstackConnection import CSConnection as MarvinCSConnection
 from marvin.cloudstackException import CloudstackAPIException
 
-
-from marvin.cloudstackAPI.cloudstackAPIClient import CloudStackAPIClient as MarvinCloudStackAPIClient
-from csapi.model import Struct
+from csapi.commands import command_class, new_command, new_response, response_class, UnknownCommandException
+from csapi.batch import BatchExecutor, DELETE_CONCURRENCY, CREATE_CONCURRENCY, pipeline
+from csapi.paging import iter_pages, DEFAULT_PAGE_SIZE
+from csapi.convert import copy_to_object, new_object
 
 TRACE = os.environ.get('TRACE', 0) == '1'
-DEBUG = TRACE or os.environ.get('DEBUG', 0) == '1'
+TRACE_HTTP = os.environ.get('TRACE_HTTP', 0) == '1'
+DEBUG = TRACE or TRACE_HTTP or os.environ.get('DEBUG', 0) == '1'
 
 if DEBUG:
     logging.basicConfig(level=logging.DEBUG)
@@ -45,7 +49,7 @@ if DEBUG:
 else:
     logger.setLevel(logging.INFO)
 
-if TRACE:
+if TRACE_HTTP:
     import httplib
 
     httplib.HTTPConnection.debuglevel = 1
@@ -54,38 +58,147 @@ if TRACE:
     requests_log.propagate = True
 
 
-def copy_to_object(obj, d, set_all=False):
-    """Utility function to apply dict-like objects onto object properties.
-    
-    :type obj: object
-    :type d: object | dict
-    :type set_all: bool
+def apply_filters(cmd, filters):
+    """Sets filters on a list command, refusing any that the command does not have.
+
+    :type cmd: object
+    :type filters: dict
     """
-    mapping = d
-    if not isinstance(d, Mapping):
-        mapping = d.__dict__
-    if set_all:
-        for key, val in mapping.iteritems():
-            if not callable(val):
-                setattr(obj, key, val)
-    else:
-        for key, val in obj.__dict__.iteritems():
-            if not callable(val) and key in mapping:
-                setattr(obj, key, mapping.get(key))
-    return obj
-
-
-def new_object(constructor, d, set_all=False):
+    for key, value in filters.iteritems():
+        if key not in cmd.__dict__:
+            raise TypeError("%s has no filter %s" % (cmd.__class__.__name__, key))
+        setattr(cmd, key, value)
+    return cmd
+
+
+def index_by(results, key):
+    """Groups results by the value of their key attribute.
+
+    :type results: collections.Iterable
+    :type key: str
+    :rtype: dict[object, list]
     """
-    Utility function to apply dict-like objects onto new instance of a type.
-    
-    :type constructor: callable
-    :type d: object
-    :type set_all: bool
+    index = {}
+    for result in results or []:
+        index.setdefault(getattr(result, key, None), []).append(result)
+    return index
+
+
+class IdentityMap(object):
+    """The model objects of a connection, one per type and id.
+
+    Loading a result with the id of an object that is still in use refreshes
+    that object in place instead of creating another. Fields changed locally
+    but not sent yet are kept, so listing in between does not lose them.
+    Only weak references are kept, so objects are freed when nothing else
+    uses them.
     """
-    result = constructor()
-    copy_to_object(result, d, set_all=set_all)
-    return result
+
+    def __init__(self):
+        self._objects = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def load(self, model_class, result, keep_changes=True):
+        """The model_class object with the id of result, with the attributes of result applied.
+
+        Fields are marked clean as fetched, model fields missing from result
+        as None. Unless keep_changes is False, as it is for the response to
+        sending those very changes, fields the object reports in changes()
+        keep their local value and stay changed if that differs from the
+        fetched one.
+
+        :type model_class: type
+        :type result: object
+        :type keep_changes: bool
+        """
+        object_id = getattr(result, 'id', None)
+        if object_id is None:
+            obj = new_object(model_class, result, set_all=True)
+            obj.mark_clean()
+            return obj
+        key = (model_class, object_id)
+        with self._lock:
+            obj = self._objects.get(key)
+            if obj is None:
+                obj = new_object(model_class, result, set_all=True)
+                self._objects[key] = obj
+                obj.mark_clean()
+            else:
+                pending = obj.changes() if keep_changes else None
+                # results leave out null fields, those are reset rather than left as they were
+                copy_to_object(obj, new_object(model_class, result, set_all=True), set_all=True)
+                obj.mark_clean()
+                if pending:
+                    obj.update(pending)
+            return obj
+
+    def get(self, model_class, object_id):
+        """The model_class object with object_id, if one is in use.
+
+        :type model_class: type
+        """
+        return self._objects.get((model_class, object_id))
+
+    def __len__(self):
+        return len(self._objects)
+
+
+class RequestSigner(object):
+    """Computes request signatures the way the management server checks them.
+
+    The signature is an HMAC-SHA1 over all parameters, sorted by lowercased
+    name, with lowercased names and lowercased url-encoded values. HMAC
+    objects are keyed once per secret key and copied for every request, and
+    the sort order of the parameters of each command is computed once from
+    its typeInfo.
+    """
+    _common_params = ['apiKey', 'command', 'response', 'sessionkey']
+
+    def __init__(self):
+        self._macs = {}
+        self._orders = {}
+
+    def prepare(self, cmd_name, cmd_class):
+        """Precomputes the parameter order for a command, once per command."""
+        if cmd_name in self._orders:
+            return
+        names = set(getattr(cmd_class, 'typeInfo', {}).keys())
+        names.update(self._common_params)
+        order = [(name, name.lower()) for name in sorted(names, key=str.lower)]
+        self._orders[cmd_name] = (order, frozenset(names))
+
+    def sign(self, payload, secret_key):
+        """
+        :type payload: dict
+        :type secret_key: str
+        :rtype: str
+        """
+        prepared = self._orders.get(payload.get('command'))
+        if prepared is not None and prepared[1].issuperset(payload):
+            order = prepared[0]
+        else:
+            # unknown command, or list parameters expanded to name[0].key
+            order = [(name, name.lower()) for name in sorted(payload, key=str.lower)]
+        hash_str = "&".join(["%s=%s" % (lower_name, self.encode(payload[name]))
+                             for name, lower_name in order if name in payload])
+        mac = self._macs.get(secret_key)
+        if mac is None:
+            mac = hmac.new(secret_key, digestmod=hashlib.sha1)
+            self._macs[secret_key] = mac
+        mac = mac.copy()
+        mac.update(hash_str)
+        return base64.b64encode(mac.digest())
+
+    @staticmethod
+    def encode(value):
+        if isinstance(value, unicode):
+            value = value.encode('utf-8')
+        else:
+            value = str(value)
+        return urllib.quote_plus(value).lower().replace("+", "%20")
+
+
+_signer = RequestSigner()
 
 
 class CloudstackAPIFailureException(CloudstackAPIException):
@@ -100,190 +213,383 @@ class CloudstackMultipleResultsException(CloudstackAPIException):
     pass
 
 
-class CSConnection(MarvinCSConnection):
-    """Simplified CSConnection that provides sane defaults."""
-
-    # noinspection PyUnresolvedReferences
-    def __init__(self, **kw):
-        global logger
-        self.log = logger
-        env = os.environ
-        conf = dict(
-            asyncTimeout=10,
-            host=kw.get('host', env.get('CS_HOST', 'localhost')),
-            port=kw.get('port', int(env.get('CS_PORT', '8080'))),
-            user=kw.get('user', env.get('CS_USER', 'admin')),
-            password=kw.get('password', env.get('CS_PASSWORD', 'password')),
-            domain=kw.get('domain', env.get('CS_DOMAIN', None)),
-            certCAPath='NA',
-            certPath='NA',
-            path='client/api',
-            apiKey=kw.get('apiKey', env.get('CS_API_KEY', None)),
-            secretKey=kw.get('secretKey', env.get('CS_SECRET_KEY', None)),
-            protocol=kw.get('protocol', env.get('CS_PROTOCOL', None)),
-            baseUrl=kw.get('baseUrl', env.get('CS_BASE_URL', None))
-        )
-        conf['mgtSvrIp'] = conf['host']  # why....
-        conf['securityKey'] = conf['secretKey']  # oh god why???
-        conf['passwd'] = conf['password']  # some consistency != foolish
-        conf['useHttps'] = False
-        conf = Struct(**conf)
-        if conf.protocol is None:
-            if conf.port == 443:
-                conf.protocol = 'https'
-                conf.useHttps = True
-            else:
-                conf.protocol = 'http'
-                conf.useHttps = False
-        if conf.baseUrl is None:
-            conf.baseUrl = "%s://%s:%d/%s" % (
-                conf.protocol, conf.host, conf.port, conf.path)
-        merged = dict()
-        merged.update(env)
-        merged.update(kw)
-        merged.update(conf)
-        merged = Struct(**merged)
-
-        self.log.info("Attempting a connection to %s" % merged.baseUrl)
-
-        self.__find_api_keys(merged)
-
-        super(CSConnection, self).__init__(
-            merged, asyncTimeout=conf.asyncTimeout, logger=self.log, path=conf.path)
-
-    def post(self, url, data=None, **kwargs):
-        result = requests.post(url, data=dict(data), **kwargs)
-        result.raise_for_status()
-        if TRACE and hasattr(result, 'text') and self.log.isEnabledFor(logging.DEBUG):
-            try:
-                doc = ET.fromstring(result.text)
-                print 'body:',
-                ET.ElementTree(doc).write(sys.stdout)
-            except SyntaxError:
-                print 'body:', result.text
-        return result
+class CloudStackAPIClient(object):
+    """Drop-in for marvin's generated CloudStackAPIClient.
 
-    @staticmethod
-    def __get_session_id(r):
-        cookies = r.headers['Set-cookie']
-        match_obj = re.match(r'.*?JSESSIONID=(.+);.*', cookies, re.M | re.I)
-        if match_obj is None:
-            raise CloudstackAPIException("Login failed, no JSESSIONID cookie found in response")
-        session_id = match_obj.group(1)
-        return session_id
-
-    def __login(self, details):
-        url = details.baseUrl + '?login'
-        payload = Struct(
-            command='login',
-            username=details.user,
-            password=details.password,
-            domain=details.domain
-        )
-        r = self.post(url, data=payload)
-        session_id = self.__get_session_id(r)
-        doc = ET.fromstring(r.text)
-        session_key = doc.findtext('.//sessionkey')
-        if session_key is None:
-            raise CloudstackAPIException(
-                "Login failed, no <sessionkey/> found in response")
-        user_id = doc.findtext('.//userid')
-        if user_id is None:
-            raise CloudstackAPIException(
-                "Login failed, no <userid/> found in response")
-
-        session = dict(sessionId=session_id, sessionKey=session_key, userId=user_id,
-                       cookies=dict(JSESSIONID=session_id))
-        session = namedtuple('Session', session.keys())(*session.values())
-        if TRACE:
-            print "established session:"
-            pprint.pprint(session)
-        return session
-
-    def __get_existing_api_keys(self, details, session):
-        payload = Struct(
-            command='listUsers',
-            id=session.userId,
-            sessionkey=session.sessionKey
-        )
-        if TRACE:
-            pprint.pprint(payload)
+    Marvin's client imports every command module up front. This one has the
+    same methods, e.g. ``client.listUsers(cmd, method="GET")``, but creates
+    each of them when it is first called, importing just that command.
+    """
+
+    def __init__(self, connection):
+        """:type connection: csapi.connection.CSConnection"""
+        self.connection = connection
+        self._id = None
+
+    def __copy__(self):
+        return CloudStackAPIClient(copy.copy(self.connection))
+
+    @property
+    def id(self):
+        return self._id
+
+    @id.setter
+    def id(self, identifier):
+        self._id = identifier
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
         try:
-            r = self.post(details.baseUrl, data=payload, cookies=session.cookies)
-        except requests.HTTPError, e:
-            if not hasattr(e, 'response'):
-                raise
-            response = e.response
-            if not hasattr(response, 'status_code'):
-                raise
-            status_code = response.status_code
-            if status_code == 401:
-                print "__get_existing_api_keys() got 401 on listUsers, returning None"
-                return None, None
-            else:
-                raise
-        doc = ET.fromstring(r.text)
-        api_key = doc.findtext('.//apikey')
-        secret_key = doc.findtext('.//secretkey')
-        return api_key, secret_key  # both can be None
-
-    def __register_api_keys(self, details, session):
-        payload = Struct(
-            command='registerUserKeys',
-            id=session.userId,
-            sessionkey=session.sessionKey
-        )
-        if TRACE:
-            pprint.pprint(payload)
-        r = self.post(details.baseUrl, data=payload, cookies=session.cookies)
-        doc = ET.fromstring(r.text)
-        api_key = doc.findtext('.//apikey')
-        secret_key = doc.findtext('.//secretkey')
-        return api_key, secret_key  # both can be None
-
-    def __find_api_keys(self, details):
-        if details.apiKey is not None and details.securityKey is not None:
-            return
+            response_type = response_class(name)
+        except (UnknownCommandException, AttributeError):
+            raise AttributeError("%s has no command %s" % (self.__class__.__name__, name))
 
-        session = self.__login(details)
-        api_key, secret_key = self.__get_existing_api_keys(details, session)
-        if api_key is None or secret_key is None:
-            api_key, secret_key = self.__register_api_keys(details, session)
-            if api_key is None or secret_key is None:
-                raise CloudstackAPIException(
-                    "Key registration failed, no <apikey/> or <secretkey/> found in response")
+        def command(cmd, method="GET"):
+            return self.connection.marvinRequest(cmd, response_type=response_type(), method=method)
+        command.__name__ = name
+        # later calls find the method on the instance and skip __getattr__
+        setattr(self, name, command)
+        return command
 
-        details.apiKey = api_key
-        details.secretKey = secret_key
-        details.securityKey = secret_key  # kill me now
 
+DEFAULT_CONNECTION = 'default'
 
-class CloudStackAPIClient(MarvinCloudStackAPIClient):
-    pass
+
+class ConnectionRegistry(object):
+    """Named connections, created on first use and shared between threads.
+
+    A connection is registered either ready-made, or as the CSConnection
+    arguments to log in with once it is first needed. The default connection
+    needs no registration, it is configured from the environment.
+
+    Which connection is current is tracked per thread, so that threads can
+    work as different users or against different servers side by side.
+    """
+
+    def __init__(self):
+        self._settings = {}
+        self._connections = {}
+        self._owned = set()
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def register(self, name, connection=None, **kwargs):
+        """
+        :type name: str
+        :type connection: csapi.connection.CSConnection
+        """
+        with self._lock:
+            if name in self._settings or name in self._connections:
+                raise ValueError("A connection named %s is already registered" % name)
+            if connection is not None:
+                self._connections[name] = (connection, CloudStackAPIClient(connection))
+            else:
+                self._settings[name] = kwargs
+
+    def unregister(self, name):
+        """Forgets a connection, closing it if the registry created it."""
+        with self._lock:
+            self._settings.pop(name, None)
+            self._locks.pop(name, None)
+            entry = self._connections.pop(name, None)
+            owned = name in self._owned
+            self._owned.discard(name)
+        if entry is not None and owned:
+            entry[0].close()
+
+    def names(self):
+        """:rtype: list[str]"""
+        with self._lock:
+            return sorted(set(self._settings) | set(self._connections))
+
+    def __contains__(self, name):
+        with self._lock:
+            return name in self._settings or name in self._connections
+
+    def __entry(self, name):
+        entry = self._connections.get(name)
+        if entry is not None:
+            return entry
+        with self._lock:
+            if name not in self._settings and name != DEFAULT_CONNECTION:
+                raise KeyError("No connection named %s is registered" % name)
+            kwargs = self._settings.get(name, {})
+            lock = self._locks.setdefault(name, threading.Lock())
+        # log in outside of the registry lock, other connections stay usable meanwhile
+        with lock:
+            entry = self._connections.get(name)
+            if entry is None:
+                from csapi.connection import CSConnection
+                connection = CSConnection(**kwargs)
+                entry = (connection, CloudStackAPIClient(connection))
+                with self._lock:
+                    self._connections[name] = entry
+                    self._owned.add(name)
+        return entry
+
+    def connection(self, name=None):
+        """:rtype: csapi.connection.CSConnection"""
+        return self.__entry(name or self.current())[0]
+
+    def api_client(self, name=None):
+        """:rtype: CloudStackAPIClient"""
+        return self.__entry(name or self.current())[1]
+
+    def current(self):
+        """Name of the connection the calling thread is using.
+
+        :rtype: str
+        """
+        stack = getattr(self._local, 'stack', None)
+        if stack:
+            return stack[-1]
+        return DEFAULT_CONNECTION
+
+    @contextmanager
+    def using(self, name):
+        """Makes name the current connection of the calling thread within a with block.
+
+        :type name: str
+        """
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(name)
+        try:
+            yield
+        finally:
+            stack.pop()
+
+
+connections = ConnectionRegistry()
 
 
 class CloudStackObjectAPI(object):
-    _connection = None
-    _api_client = None
-    _initialized = False
+    """Base class of the object APIs.
 
-    @classmethod
-    def init_connection(cls, **kwargs):
-        if cls._initialized:
-            return
-        cls._initialized = True
-        cls._connection = CSConnection(**kwargs)
-        cls._api_client = CloudStackAPIClient(cls._connection)
+    An API can be bound to a CSConnection, or to the name of a connection in
+    the registry. An unbound API uses the calling thread's current connection.
 
-    @classmethod
-    def connection(cls):
-        cls.init_connection()
-        return cls._connection
+    Subclasses set model, the model class they manage, and list_command; the
+    create, update and delete commands are named after the model class.
 
-    @classmethod
-    def api_client(cls):
-        cls.init_connection()
-        return cls._api_client
+    Results are loaded into model objects through the connection's identity
+    map, so a listing returns the objects already in use for the same ids.
+    List calls go through the connection's result cache, if it has one.
+    cache_group is the group its results are cached under, and a successful
+    write drops the cached results of all groups in invalidates.
+    """
+    model = None
+    list_command = None
+    # the field delete_all matches objects by
+    name_field = 'name'
+    # whether find() lists across all domains and accounts unless told otherwise
+    find_listall = True
+    cache_group = None
+    invalidates = []
+
+    def __init__(self, connection=None, registry=None):
+        """
+        :type connection: csapi.connection.CSConnection|str
+        :type registry: ConnectionRegistry
+        """
+        if registry is None:
+            registry = connections
+        self.registry = registry
+        self._connection_name = None
+        self._connection = None
+        self._api_client = None
+        if isinstance(connection, basestring):
+            self._connection_name = connection
+        elif connection is not None:
+            self._connection = connection
+            self._api_client = CloudStackAPIClient(connection)
 
-    def __init__(self):
-        self.init_connection()
+    @classmethod
+    def init_connection(cls, **kwargs):
+        """Configures the default connection, unless that has already been done."""
+        try:
+            connections.register(DEFAULT_CONNECTION, **kwargs)
+        except ValueError:
+            pass
+
+    def bound(self):
+        """This API, bound to the connection it would use right now.
+
+        Hand this to other threads, which have their own current connection.
+
+        :rtype: CloudStackObjectAPI
+        """
+        if self._connection is not None or self._connection_name is not None:
+            return self
+        return self.__class__(self.registry.current(), registry=self.registry)
+
+    def connection(self):
+        """:rtype: csapi.connection.CSConnection"""
+        if self._connection is not None:
+            return self._connection
+        return self.registry.connection(self._connection_name)
+
+    def api_client(self):
+        """:rtype: CloudStackAPIClient"""
+        if self._api_client is not None:
+            return self._api_client
+        return self.registry.api_client(self._connection_name)
+
+    def identity_map(self):
+        """:rtype: IdentityMap"""
+        return self.connection().identity_map
+
+    def _list(self, command_name, cmd):
+        """Sends a list command, or returns its cached raw results."""
+        cache = getattr(self.connection(), 'result_cache', None)
+        if cache is None:
+            return getattr(self.api_client(), command_name)(cmd)
+        key = cache.key(command_name, cmd.__dict__)
+        cached, results = cache.get(key)
+        if cached:
+            return results
+        generation = cache.generation(self.cache_group)
+        results = getattr(self.api_client(), command_name)(cmd)
+        cache.put(self.cache_group, key, results, generation)
+        return results
+
+    def _invalidate(self):
+        cache = getattr(self.connection(), 'result_cache', None)
+        if cache is not None:
+            for group in self.invalidates:
+                cache.invalidate(group)
+
+    def create(self, obj):
+        """:type obj: csapi.model.Struct"""
+        command = 'create' + self.model.__name__
+        cmd = new_object(command_class(command), obj)
+        created = getattr(self.api_client(), command)(cmd, method="POST")
+        self._invalidate()
+        return self.identity_map().load(self.model, created)
+
+    def create_many(self, objs, max_concurrency=CREATE_CONCURRENCY):
+        """Creates objs, max_concurrency at a time, yielding a BatchResult for each as it is done.
+
+        objs can be any iterable, it is consumed as creations complete. A
+        failed creation is reported in its BatchResult, the others carry on.
+
+        :type objs: collections.Iterable[csapi.model.Struct]
+        :type max_concurrency: int
+        :rtype: collections.Iterator[csapi.batch.BatchResult]
+        """
+        api = self.bound()
+        tasks = ((obj, partial(api.create, obj)) for obj in objs)
+        return pipeline(tasks, max_concurrency=max_concurrency)
+
+    def update(self, obj):
+        """Sends the fields of obj that changed since it was loaded, if any.
+
+        :type obj: csapi.model.Struct
+        """
+        changes = obj.changes()
+        if not changes:
+            return obj
+        command = 'update' + self.model.__name__
+        cmd = new_object(command_class(command), changes)
+        cmd.id = obj.id
+        updated = getattr(self.api_client(), command)(cmd, method="POST")
+        self._invalidate()
+        return self.identity_map().load(self.model, updated, keep_changes=False)
+
+    def delete(self, obj):
+        """:type obj: csapi.model.Struct|int"""
+        if isinstance(obj, int):
+            obj_id = obj
+        else:
+            obj_id = obj.id
+        command = 'delete' + self.model.__name__
+        cmd = new_command(command)
+        cmd.id = obj_id
+        result = getattr(self.api_client(), command)(cmd, method="POST")
+        if not result.success:
+            raise CloudstackAPIFailureException(
+                "deletion failed for id %s" % obj_id)
+        self._invalidate()
+
+    def delete_all(self, *args):
+        """Deletes every object with the same name_field as one of args, concurrently.
+
+        :type *args: list[csapi.model.Struct]
+        :rtype: csapi.batch.BatchReport
+        """
+        cmd = new_command(self.list_command)
+        cmd.listall = True
+        existing = index_by(getattr(self.api_client(), self.list_command)(cmd), self.name_field)
+        batch = BatchExecutor(max_concurrency=DELETE_CONCURRENCY)
+        deleted = set()
+        for obj in args:
+            for result in existing.get(getattr(obj, self.name_field), []):
+                if result.id not in deleted:
+                    deleted.add(result.id)
+                    batch.delete(self, result)
+        report = batch.report()
+        batch.shutdown()
+        return report
+
+    def list(self, **kwargs):
+        """:rtype: collections.Sequence[csapi.model.Struct]"""
+        cmd = new_command(self.list_command)
+        copy_to_object(cmd, kwargs)
+        results = self._list(self.list_command, cmd)
+        if results is None:
+            return []
+        identity_map = self.identity_map()
+        return list([identity_map.load(self.model, a) for a in results])
+
+    def stream(self, **kwargs):
+        """Like list, but yields each object as soon as it has been received.
+
+        :rtype: collections.Iterator[csapi.model.Struct]
+        """
+        cmd = new_command(self.list_command)
+        copy_to_object(cmd, kwargs)
+        connection = self.connection()
+        for result in connection.stream(cmd, new_response(self.list_command)):
+            yield connection.identity_map.load(self.model, result)
+
+    def iter_list(self, pagesize=DEFAULT_PAGE_SIZE, **kwargs):
+        """Like list, but fetches pagesize objects at a time, the next page while the current one is consumed.
+
+        :type pagesize: int
+        :rtype: collections.Iterator[csapi.model.Struct]
+        """
+        api_client = self.api_client()
+        identity_map = self.identity_map()
+        list_command = self.list_command
+
+        def list_page(page):
+            cmd = new_command(list_command)
+            copy_to_object(cmd, kwargs)
+            cmd.page = page
+            cmd.pagesize = pagesize
+            return getattr(api_client, list_command)(cmd)
+        for result in iter_pages(list_page, pagesize):
+            yield identity_map.load(self.model, result)
+
+    def find(self, **kwargs):
+        """Finds the one object matching kwargs, which are all passed to the server as filters.
+
+        :rtype: csapi.model.Struct
+        """
+        cmd = apply_filters(new_command(self.list_command), kwargs)
+        if self.find_listall and cmd.listall is None:
+            cmd.listall = True
+        # a second result is all it takes to know there is more than one
+        cmd.page = 1
+        cmd.pagesize = 2
+        results = self._list(self.list_command, cmd)
+        if not results:
+            raise CloudstackNoResultsException(
+                "No results found matching %s" % repr(kwargs))
+        elif len(results) > 1:
+            raise CloudstackMultipleResultsException(
+                "Multiple results found matching %s" % repr(kwargs))
+        return self.identity_map().load(self.model, results[0])
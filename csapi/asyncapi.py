@@ -0,0 +1,204 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Non-blocking counterparts of the csapi connection and object APIs.
+
+Every call returns a csapi.futures.Future straight away and runs on a shared
+bounded worker pool, so many calls can be in flight at the same time while
+the number of threads stays fixed. Login and key discovery happen on the pool
+as well, calls made before they complete simply queue up behind them.
+
+Each call in flight does occupy a worker thread for its duration, there is
+no asyncio on python 2. With the default executor at most CS_MAX_WORKERS
+(default 64) calls are in flight at once and the rest wait in its queue.
+For more, raise CS_MAX_WORKERS or pass a bigger executor, keeping in mind
+that the connection's CS_POOL_SIZE limits how many http connections are
+kept alive.
+"""
+
+from csapi.apiclient import CloudStackAPIClient, connections
+from csapi.connection import CSConnection
+from csapi.futures import Future, default_executor
+from csapi.paging import DEFAULT_PAGE_SIZE
+from csapi.account import AccountAPI
+from csapi.domain import DomainAPI
+from csapi.user import UserAPI
+from csapi.zone import ZoneAPI
+
+
+class AsyncCSConnection(object):
+    """CSConnection that logs in in the background.
+
+    Command methods of the marvin API client are available under their usual
+    names and return futures, e.g. ``conn.listUsers(cmd).result()``.
+    """
+
+    def __init__(self, executor=None, name=None, **kwargs):
+        """
+        :type executor: csapi.futures.Executor
+        :param name: name of a connection in the registry to use, rather than
+            logging in with kwargs
+        :type name: str
+        """
+        if executor is None:
+            executor = default_executor()
+        self.executor = executor
+        self._ready = executor.submit(self.__connect, name, kwargs)
+
+    @staticmethod
+    def __connect(name, kwargs):
+        if name is not None:
+            return connections.connection(name), connections.api_client(name)
+        connection = CSConnection(**kwargs)
+        return connection, CloudStackAPIClient(connection)
+
+    def ready(self):
+        """Future that completes once login and key discovery are done.
+
+        :rtype: csapi.futures.Future
+        """
+        return self._ready
+
+    def connection(self):
+        """:rtype: CSConnection"""
+        return self._ready.result()[0]
+
+    def api_client(self):
+        """:rtype: CloudStackAPIClient"""
+        return self._ready.result()[1]
+
+    def call(self, command_name, cmd, method="GET"):
+        """:rtype: csapi.futures.Future"""
+        return self.executor.submit(self.__call, command_name, cmd, method)
+
+    def __call(self, command_name, cmd, method):
+        return getattr(self.api_client(), command_name)(cmd, method=method)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def command(cmd, method="GET"):
+            return self.call(name, cmd, method=method)
+        command.__name__ = name
+        return command
+
+
+class AsyncCloudStackObjectAPI(object):
+    """Wraps an object API so that each of its methods returns a future.
+
+    Calls run on pool threads, so an API that is not given a connection binds
+    to the connection that is current in the thread that creates it.
+    """
+    api_class = None
+
+    def __init__(self, executor=None, connection=None, **kwargs):
+        """
+        :type executor: csapi.futures.Executor
+        :type connection: csapi.connection.CSConnection|str
+        """
+        if executor is None:
+            executor = default_executor()
+        self.executor = executor
+        if connection is None:
+            connection = connections.current()
+        self._api = executor.submit(self.__connect, connection, kwargs)
+
+    def __connect(self, connection, kwargs):
+        if kwargs:
+            self.api_class.init_connection(**kwargs)
+        api = self.api_class(connection)
+        api.connection()
+        return api
+
+    def ready(self):
+        """:rtype: csapi.futures.Future"""
+        return self._api
+
+    def _submit(self, method_name, *args, **kwargs):
+        return self.executor.submit(self.__call, method_name, args, kwargs)
+
+    def __call(self, method_name, args, kwargs):
+        return getattr(self._api.result(), method_name)(*args, **kwargs)
+
+    def create(self, obj):
+        """:rtype: csapi.futures.Future"""
+        return self._submit('create', obj)
+
+    def update(self, obj):
+        """:rtype: csapi.futures.Future"""
+        return self._submit('update', obj)
+
+    def delete(self, obj):
+        """:rtype: csapi.futures.Future"""
+        return self._submit('delete', obj)
+
+    def delete_all(self, *args):
+        """:rtype: csapi.futures.Future"""
+        return self._submit('delete_all', *args)
+
+    def list(self, **kwargs):
+        """:rtype: csapi.futures.Future"""
+        return self._submit('list', **kwargs)
+
+    def find(self, **kwargs):
+        """:rtype: csapi.futures.Future"""
+        return self._submit('find', **kwargs)
+
+    def iter_list(self, pagesize=DEFAULT_PAGE_SIZE, **kwargs):
+        """Futures of consecutive pages of list results, each a list of model objects.
+
+        A page is requested as soon as the page before it turns out to be
+        full, without waiting for the caller to get there, but never more than
+        one page ahead of the caller. Iteration ends after the first page that
+        is not full or fails::
+
+            for page in api.iter_list(pagesize=100, listall=True):
+                for account in page.result():
+                    ...
+
+        :type pagesize: int
+        :rtype: collections.Iterator[csapi.futures.Future]
+        """
+        page = 1
+        current = self._submit('list', page=page, pagesize=pagesize, **kwargs)
+        while current is not None:
+            # resolves to the future of the next page, or None when there is none
+            following = Future()
+            current.add_done_callback(
+                lambda future, page=page, following=following: following.set_result(
+                    self._submit('list', page=page + 1, pagesize=pagesize, **kwargs)
+                    if future.succeeded() and len(future.result()) >= pagesize else None))
+            yield current
+            current = following.result()
+            page += 1
+
+
+class AsyncAccountAPI(AsyncCloudStackObjectAPI):
+    api_class = AccountAPI
+
+
+class AsyncDomainAPI(AsyncCloudStackObjectAPI):
+    api_class = DomainAPI
+
+
+class AsyncUserAPI(AsyncCloudStackObjectAPI):
+    api_class = UserAPI
+
+
+class AsyncZoneAPI(AsyncCloudStackObjectAPI):
+    api_class = ZoneAPI
@@ -0,0 +1,195 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Bounded-concurrency execution of many object API operations."""
+
+import threading
+import Queue
+
+from csapi.futures import Executor, wait_all
+
+_operations = ['create', 'update', 'delete']
+
+# deletions that delete_all runs at the same time
+DELETE_CONCURRENCY = 16
+
+# creations that create_many runs at the same time
+CREATE_CONCURRENCY = 16
+
+
+class BatchResult(object):
+    """Outcome of a single operation in a batch."""
+
+    def __init__(self, operation, item, future):
+        """
+        :type operation: str
+        :type future: csapi.futures.Future
+        """
+        self.operation = operation
+        self.item = item
+        self.future = future
+
+    @property
+    def succeeded(self):
+        """:rtype: bool"""
+        return self.future.succeeded()
+
+    @property
+    def result(self):
+        if not self.succeeded:
+            return None
+        return self.future.result()
+
+    @property
+    def error(self):
+        """:rtype: Exception"""
+        return self.future.exception()
+
+    def __repr__(self):
+        if self.succeeded:
+            outcome = 'ok'
+        else:
+            outcome = repr(self.error)
+        return "BatchResult(%s %r: %s)" % (self.operation, self.item, outcome)
+
+
+class BatchReport(object):
+    """Aggregated outcome of a batch, one BatchResult per item."""
+
+    def __init__(self, results):
+        """:type results: list[BatchResult]"""
+        self.results = results
+
+    @property
+    def succeeded(self):
+        """:rtype: list[BatchResult]"""
+        return [r for r in self.results if r.succeeded]
+
+    @property
+    def failed(self):
+        """:rtype: list[BatchResult]"""
+        return [r for r in self.results if not r.succeeded]
+
+    @property
+    def ok(self):
+        """:rtype: bool"""
+        return len(self.failed) == 0
+
+    def __len__(self):
+        return len(self.results)
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __repr__(self):
+        return "BatchReport(%d succeeded, %d failed)" % (len(self.succeeded), len(self.failed))
+
+
+class BatchExecutor(object):
+    """Runs create/update/delete operations on object APIs concurrently.
+
+    Operations are started as soon as they are submitted, at most
+    max_concurrency at a time. A failing operation only fails its own future,
+    the rest of the batch carries on::
+
+        batch = BatchExecutor(max_concurrency=32)
+        for account in accounts:
+            batch.create(account_api, account)
+        report = batch.report()
+        for failure in report.failed:
+            print failure.item, failure.error
+    """
+
+    def __init__(self, max_concurrency=16):
+        """:type max_concurrency: int"""
+        self.executor = Executor(max_workers=max_concurrency, name='csapi-batch')
+        self._results = []
+        self._lock = threading.Lock()
+
+    def submit(self, api, operation, item):
+        """
+        :type api: csapi.apiclient.CloudStackObjectAPI
+        :type operation: str
+        :rtype: csapi.futures.Future
+        """
+        if operation not in _operations:
+            raise ValueError("operation should be one of %s, not %s" % (", ".join(_operations), operation))
+        # operations run on other threads, which would not see the calling thread's current connection
+        future = self.executor.submit(getattr(api.bound(), operation), item)
+        with self._lock:
+            self._results.append(BatchResult(operation, item, future))
+        return future
+
+    def create(self, api, item):
+        """:rtype: csapi.futures.Future"""
+        return self.submit(api, 'create', item)
+
+    def update(self, api, item):
+        """:rtype: csapi.futures.Future"""
+        return self.submit(api, 'update', item)
+
+    def delete(self, api, item):
+        """:rtype: csapi.futures.Future"""
+        return self.submit(api, 'delete', item)
+
+    def submit_all(self, api, operation, items):
+        """:rtype: list[csapi.futures.Future]"""
+        return [self.submit(api, operation, item) for item in items]
+
+    def report(self, timeout=None):
+        """Waits for everything submitted so far and reports on it.
+
+        :rtype: BatchReport
+        """
+        with self._lock:
+            results = list(self._results)
+        wait_all([r.future for r in results], timeout=timeout)
+        return BatchReport(results)
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+
+def pipeline(tasks, operation='create', max_concurrency=CREATE_CONCURRENCY):
+    """Runs tasks concurrently, yielding a BatchResult for each in the order they complete.
+
+    tasks are (item, task) pairs, taken from the iterable only as workers free
+    up, so it may be a generator over any number of them. A failing task only
+    fails its own result, the rest carry on. If the caller stops iterating,
+    tasks already running are left to finish.
+
+    :type tasks: collections.Iterable[(object, () -> object)]
+    :type operation: str
+    :type max_concurrency: int
+    :rtype: collections.Iterator[BatchResult]
+    """
+    executor = Executor(max_workers=max_concurrency, name='csapi-pipeline')
+    completed = Queue.Queue()
+    in_flight = 0
+    try:
+        for item, task in tasks:
+            while in_flight >= max_concurrency:
+                in_flight -= 1
+                yield completed.get()
+            result = BatchResult(operation, item, executor.submit(task))
+            result.future.add_done_callback(lambda future, result=result: completed.put(result))
+            in_flight += 1
+        while in_flight > 0:
+            in_flight -= 1
+            yield completed.get()
+    finally:
+        executor.shutdown(wait=False)
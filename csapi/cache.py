@@ -0,0 +1,119 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Caching of list results between writes."""
+
+import time
+import threading
+from collections import OrderedDict
+
+# command attributes that are not request parameters
+_ignored_params = ['isAsync', 'required', 'typeInfo']
+
+
+def _normalize(value):
+    if isinstance(value, bool):
+        return str(value).lower()
+    if isinstance(value, (list, tuple)):
+        return tuple([_normalize(v) for v in value])
+    if isinstance(value, dict):
+        return tuple(sorted([(k, _normalize(v)) for k, v in value.iteritems()]))
+    if isinstance(value, basestring):
+        return value
+    return str(value)
+
+
+class ResultCache(object):
+    """Least recently used list results, each kept for at most ttl seconds.
+
+    Results belong to a group, the model type they list, and a write drops
+    every result of the groups it may have changed. Each group has a
+    generation that a write increments, so a listing that was sent before a
+    write but returns after it is not cached.
+    """
+
+    def __init__(self, ttl=30.0, max_entries=1000):
+        """
+        :type ttl: float
+        :type max_entries: int
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(command, params):
+        """Key of a list command, the same for equivalent filters.
+
+        :type command: str
+        :type params: dict
+        """
+        items = []
+        for name, value in params.iteritems():
+            if value is None or name in _ignored_params:
+                continue
+            items.append((name.lower(), _normalize(value)))
+        return command, tuple(sorted(items))
+
+    def generation(self, group):
+        """Read this before sending the command whose results will be put.
+
+        :type group: str
+        """
+        with self._lock:
+            return self._epoch, self._generations.get(group, 0)
+
+    def get(self, key):
+        """:returns: whether the key was cached, and its results"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or entry[0] < time.time():
+                self.misses += 1
+                return False, None
+            self._entries[key] = entry
+            self.hits += 1
+            return True, entry[2]
+
+    def put(self, group, key, results, generation):
+        """
+        :type group: str
+        :param generation: what generation() returned before the command was sent
+        """
+        with self._lock:
+            if (self._epoch, self._generations.get(group, 0)) != generation:
+                return
+            self._entries.pop(key, None)
+            self._entries[key] = (time.time() + self.ttl, group, results)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, group):
+        """:type group: str"""
+        with self._lock:
+            self._generations[group] = self._generations.get(group, 0) + 1
+            for key in [k for k, entry in self._entries.iteritems() if entry[1] == group]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
@@ -0,0 +1,204 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Recording and replaying of API traffic."""
+
+import gzip
+import json
+import atexit
+import threading
+import logging
+from StringIO import StringIO
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from marvin.cloudstackException import CloudstackAPIException
+
+logger = logging.getLogger("csapi.cassette")
+
+RECORD = 'record'
+REPLAY = 'replay'
+
+# parameters that differ between otherwise identical requests, or are secret
+#
+# startdate is only sent by the async job poller, and derived from the clock
+_volatile_params = ['signature', 'apikey', 'sessionkey', 'password', 'startdate']
+
+_format_version = 1
+
+
+class CassetteMissException(CloudstackAPIException):
+    pass
+
+
+def request_key(method, params):
+    """Normalized key that identifies equivalent requests.
+
+    :type method: str
+    :type params: dict
+    :rtype: str
+    """
+    normalized = []
+    for name, value in params.iteritems():
+        name = name.lower()
+        if name in _volatile_params:
+            continue
+        if isinstance(value, unicode):
+            value = value.encode('utf-8')
+        normalized.append((name, str(value)))
+    normalized.sort()
+    return json.dumps([method.upper(), normalized], separators=(',', ':'))
+
+
+class CassetteResponse(object):
+    """Just enough of requests.Response to stand in for a recorded response."""
+
+    def __init__(self, status_code, headers, content, url=None):
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self.url = url
+        self.raw = StringIO(content)
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if 400 <= self.status_code < 600:
+            raise requests.HTTPError("%d error for url %s" % (self.status_code, self.url), response=self)
+
+    def close(self):
+        pass
+
+
+class Cassette(object):
+    """A gzip-compressed file of recorded request/response pairs.
+
+    The file starts with a header line, followed by one JSON object per
+    response that carries the normalized key of its request. Replaying loads
+    the file once into an index from key to responses. Identical requests get
+    their recorded responses in order, the last one repeating once they run
+    out.
+    """
+
+    def __init__(self, path, mode=REPLAY):
+        """
+        :type path: str
+        :type mode: str
+        """
+        if mode not in [RECORD, REPLAY]:
+            raise ValueError("Cassette mode should be %s or %s, not %s" % (RECORD, REPLAY, mode))
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._index = {}
+        self._file = None
+        if mode == REPLAY:
+            self.__load()
+        else:
+            self._file = gzip.open(path, 'wb')
+            self.__write(dict(version=_format_version))
+            atexit.register(self.close)
+
+    def __load(self):
+        f = gzip.open(self.path, 'rb')
+        try:
+            header = json.loads(f.readline())
+            if header.get('version') != _format_version:
+                raise ValueError("Unsupported cassette version %s in %s" % (header.get('version'), self.path))
+            for line in f:
+                entry = json.loads(line)
+                self._index.setdefault(entry['key'], []).append(entry)
+        finally:
+            f.close()
+        logger.info("Loaded %d distinct requests from cassette %s" % (len(self._index), self.path))
+
+    def __write(self, entry):
+        self._file.write(json.dumps(entry, separators=(',', ':')))
+        self._file.write('\n')
+
+    def record(self, method, url, params, response):
+        """Records a response, returning a replayable copy of it.
+
+        :type response: requests.Response
+        :rtype: CassetteResponse
+        """
+        content = response.content
+        key = request_key(method, params)
+        entry = dict(key=key, status=response.status_code, headers=dict(response.headers),
+                     body=content.decode('utf-8'))
+        with self._lock:
+            self.__write(entry)
+        return CassetteResponse(response.status_code, response.headers, content, url=url)
+
+    def play(self, method, url, params):
+        """:rtype: CassetteResponse"""
+        key = request_key(method, params)
+        with self._lock:
+            entries = self._index.get(key)
+            if not entries:
+                raise CassetteMissException(
+                    params.get('command'), "no recorded response in %s for %s" % (self.path, key))
+            entry = entries[0]
+            if len(entries) > 1:
+                entries.pop(0)
+        return CassetteResponse(entry['status'], entry['headers'], entry['body'].encode('utf-8'), url=url)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class CassetteTransport(object):
+    """Transport that records what another transport does, or replays it."""
+
+    def __init__(self, cassette, transport=None):
+        """
+        :type cassette: Cassette
+        :type transport: csapi.transport.PooledTransport
+        """
+        self.cassette = cassette
+        self.transport = transport
+
+    def request(self, method, url, **kwargs):
+        params = dict(kwargs.get('params') or {})
+        params.update(kwargs.get('data') or {})
+        if self.cassette.mode == REPLAY:
+            return self.cassette.play(method, url, params)
+        response = self.transport.request(method, url, **kwargs)
+        return self.cassette.record(method, url, params, response)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def prewarm(self, url, **kwargs):
+        if self.cassette.mode == RECORD:
+            self.transport.prewarm(url, **kwargs)
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
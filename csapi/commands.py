@@ -0,0 +1,81 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Marvin command classes, imported when they are first used.
+
+marvin.cloudstackAPI has a module per command. Importing them all up front,
+as marvin's generated API client does, takes the better part of a second.
+When a command table has been generated (see csapi.registry) classes are
+built from that instead, for the commands it knows.
+"""
+
+import sys
+
+from csapi.registry import default_registry
+
+_package = 'marvin.cloudstackAPI'
+
+
+class UnknownCommandException(ImportError):
+    pass
+
+
+def command_module(name):
+    """:type name: str"""
+    module_name = '%s.%s' % (_package, name)
+    module = sys.modules.get(module_name)
+    if module is None:
+        try:
+            __import__(module_name)
+        except ImportError, e:
+            raise UnknownCommandException("No such command %s: %s" % (name, e))
+        module = sys.modules[module_name]
+    return module
+
+
+def command_class(name):
+    """The marvin <name>Cmd class.
+
+    :type name: str
+    :rtype: type
+    """
+    registry = default_registry()
+    if registry is not None and name in registry:
+        return registry.command_class(name)
+    return getattr(command_module(name), name + 'Cmd')
+
+
+def response_class(name):
+    """The marvin <name>Response class.
+
+    :type name: str
+    :rtype: type
+    """
+    registry = default_registry()
+    if registry is not None and name in registry:
+        return registry.response_class(name)
+    return getattr(command_module(name), name + 'Response')
+
+
+def new_command(name):
+    """:type name: str"""
+    return command_class(name)()
+
+
+def new_response(name):
+    """:type name: str"""
+    return response_class(name)()
@@ -0,0 +1,687 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""The connection to a management server, built on marvin's CSConnection.
+
+This is the module that imports requests and marvin's connection, which is
+most of the time it takes to import csapi. csapi.apiclient imports it when
+the first connection is created.
+"""
+
+import os
+import sys
+import re
+import time
+import threading
+from xml.etree import ElementTree as ET
+from collections import namedtuple
+from functools import partial
+
+import requests
+from requests.packages.urllib3.exceptions import NewConnectionError
+from marvin.cloudstackConnection import CSConnection as MarvinCSConnection
+from marvin.cloudstackException import CloudstackAPIException
+from marvin.codes import FAILED
+
+from csapi.model import Struct
+from csapi.commands import new_command, new_response
+from csapi.transport import PooledTransport
+from csapi.jobs import JobPoller
+from csapi.credentials import CredentialCache, DEFAULT_PATH as DEFAULT_CREDENTIAL_CACHE
+from csapi.resilience import RetryPolicy, CircuitBreaker, LatencyTracker, CircuitOpenException, GATEWAY_ERRORS
+from csapi.resilience import is_idempotent
+from csapi.endpoints import EndpointPool, parse_urls, LEAST_OUTSTANDING
+from csapi.metrics import default_metrics, QUEUE, NETWORK, POLLING, TOTAL
+from csapi.apiclient import IdentityMap, logger, TRACE, _signer
+
+# throttling, hedging, tracing, cassettes, result caching and streaming are
+# only imported by connections that use them
+
+_cassettes = {}
+_cassettes_lock = threading.Lock()
+
+
+def _cassette(path, mode):
+    """Connections share one Cassette per file and mode, so they can record to it together."""
+    from csapi.cassette import Cassette
+    with _cassettes_lock:
+        cassette = _cassettes.get((path, mode))
+        if cassette is None:
+            cassette = Cassette(path, mode=mode)
+            _cassettes[(path, mode)] = cassette
+        return cassette
+
+
+def _close_response(future):
+    """Releases the connection of a response nobody is going to read."""
+    if future.succeeded() and future.result() is not None:
+        future.result().close()
+
+
+def _never_sent(error):
+    """Whether a requests.ConnectionError happened while connecting, before anything was sent.
+
+    requests also raises ConnectionError when a connection is aborted after
+    the request was sent, and the server may well have acted on that one.
+    """
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = error.args[0] if error.args else None
+    # urllib3 wraps the cause in a MaxRetryError
+    reason = getattr(reason, 'reason', reason)
+    return isinstance(reason, NewConnectionError)
+
+
+def _check_endpoint(transport, url):
+    response = transport.request('HEAD', url, timeout=5)
+    response.close()
+    return response.status_code < 500
+
+
+class CSConnection(MarvinCSConnection):
+    """Simplified CSConnection that provides sane defaults.
+
+    Note this class shares its name with the marvin class it extends, so the
+    double underscore methods defined here are name-mangled to the same names
+    as marvin's private methods and replace them. That is how the marvin
+    request path is routed through our pooled transport.
+    """
+
+    # noinspection PyUnresolvedReferences
+    def __init__(self, **kw):
+        global logger
+        self.log = logger
+        env = os.environ
+        conf = dict(
+            asyncTimeout=kw.get('asyncTimeout', int(env.get('CS_ASYNC_TIMEOUT', '10'))),
+            pollMinInterval=kw.get('pollMinInterval', float(env.get('CS_POLL_MIN_INTERVAL', '0.5'))),
+            pollMaxInterval=kw.get('pollMaxInterval', float(env.get('CS_POLL_MAX_INTERVAL', '10'))),
+            host=kw.get('host', env.get('CS_HOST', 'localhost')),
+            port=kw.get('port', int(env.get('CS_PORT', '8080'))),
+            user=kw.get('user', env.get('CS_USER', 'admin')),
+            password=kw.get('password', env.get('CS_PASSWORD', 'password')),
+            domain=kw.get('domain', env.get('CS_DOMAIN', None)),
+            certCAPath='NA',
+            certPath='NA',
+            path='client/api',
+            apiKey=kw.get('apiKey', env.get('CS_API_KEY', None)),
+            secretKey=kw.get('secretKey', env.get('CS_SECRET_KEY', None)),
+            protocol=kw.get('protocol', env.get('CS_PROTOCOL', None)),
+            baseUrl=kw.get('baseUrl', env.get('CS_BASE_URL', None)),
+            poolSize=kw.get('poolSize', int(env.get('CS_POOL_SIZE', '10'))),
+            keepAlive=kw.get('keepAlive', env.get('CS_KEEP_ALIVE', '1') == '1'),
+            prewarm=kw.get('prewarm', env.get('CS_PREWARM', '0') == '1'),
+            credentialCache=kw.get('credentialCache', env.get('CS_CREDENTIAL_CACHE', DEFAULT_CREDENTIAL_CACHE)),
+            throttle=kw.get('throttle', env.get('CS_THROTTLE', '0') == '1'),
+            maxConcurrency=kw.get('maxConcurrency', int(env.get('CS_MAX_CONCURRENCY', '64'))),
+            apiLimitInterval=kw.get('apiLimitInterval', float(env.get('CS_API_LIMIT_INTERVAL', '1'))),
+            retries=kw.get('retries', int(env.get('CS_RETRIES', '3'))),
+            hedge=kw.get('hedge', env.get('CS_HEDGE', '0') == '1'),
+            endpointStrategy=kw.get('endpointStrategy', env.get('CS_ENDPOINT_STRATEGY', LEAST_OUTSTANDING)),
+            healthCheckInterval=kw.get('healthCheckInterval', float(env.get('CS_HEALTH_CHECK_INTERVAL', '10'))),
+            cassette=kw.get('cassette', env.get('CS_CASSETTE', None)),
+            cassetteMode=kw.get('cassetteMode', env.get('CS_CASSETTE_MODE', None)),
+            cacheTtl=kw.get('cacheTtl', float(env.get('CS_CACHE_TTL', '0'))),
+            cacheSize=kw.get('cacheSize', int(env.get('CS_CACHE_SIZE', '1000')))
+        )
+        conf['mgtSvrIp'] = conf['host']  # why....
+        conf['securityKey'] = conf['secretKey']  # oh god why???
+        conf['passwd'] = conf['password']  # some consistency != foolish
+        conf['useHttps'] = False
+        conf = Struct(**conf)
+        if conf.protocol is None:
+            if conf.port == 443:
+                conf.protocol = 'https'
+                conf.useHttps = True
+            else:
+                conf.protocol = 'http'
+                conf.useHttps = False
+        if conf.baseUrl is None:
+            conf.baseUrl = "%s://%s:%d/%s" % (
+                conf.protocol, conf.host, conf.port, conf.path)
+        endpoint_urls = parse_urls(conf.baseUrl)
+        # login and key discovery always go to the first endpoint
+        conf.baseUrl = endpoint_urls[0]
+        merged = dict()
+        merged.update(env)
+        merged.update(kw)
+        merged.update(conf)
+        merged = Struct(**merged)
+
+        self.log.info("Attempting a connection to %s" % merged.baseUrl)
+
+        self.transport = PooledTransport(pool_size=conf.poolSize, keep_alive=conf.keepAlive)
+        if conf.cassette:
+            from csapi.cassette import CassetteTransport, REPLAY
+            conf.cassetteMode = conf.cassetteMode or REPLAY
+            self.log.info("Using cassette %s in %s mode" % (conf.cassette, conf.cassetteMode))
+            self.transport = CassetteTransport(_cassette(conf.cassette, conf.cassetteMode), self.transport)
+            # cached keys would make recorded and replayed runs take different paths
+            conf.credentialCache = None
+        if conf.prewarm:
+            self.transport.prewarm(merged.baseUrl)
+
+        self.tracer = None
+        if TRACE:
+            from csapi.trace import default_sink
+            self.tracer = default_sink()
+        self.metrics = default_metrics()
+        self.throttle = None
+        self.retry_policy = RetryPolicy(attempts=conf.retries)
+        self.__breakers = {}
+        self.__breakers_lock = threading.Lock()
+        self.__latencies = {}
+        self.endpoints = None
+        if len(endpoint_urls) > 1:
+            # the health check thread must not keep this connection alive
+            self.endpoints = EndpointPool(
+                endpoint_urls, strategy=conf.endpointStrategy, check=partial(_check_endpoint, self.transport),
+                health_check_interval=conf.healthCheckInterval, owner=self)
+        self.hedge_executor = None
+        if conf.hedge:
+            from csapi.futures import Executor
+            self.hedge_executor = Executor(max_workers=conf.poolSize, name='csapi-hedge')
+        self.identity_map = IdentityMap()
+        self.result_cache = None
+        if conf.cacheTtl > 0:
+            from csapi.cache import ResultCache
+            self.result_cache = ResultCache(ttl=conf.cacheTtl, max_entries=conf.cacheSize)
+        self.credential_cache = None
+        if conf.credentialCache:
+            self.credential_cache = CredentialCache(conf.credentialCache)
+        self.__details = merged
+        self.__cached_keys = False
+        self.__find_api_keys(merged)
+
+        super(CSConnection, self).__init__(
+            merged, asyncTimeout=conf.asyncTimeout, logger=self.log, path=conf.path)
+        # marvin builds its own from mgtSvrIp and port, which knows nothing of CS_BASE_URL
+        self.baseUrl = merged.baseUrl
+
+        self.job_poller = JobPoller(
+            self, min_interval=conf.pollMinInterval, max_interval=conf.pollMaxInterval)
+
+        if conf.throttle:
+            from csapi.throttle import Throttle, AIMDController
+            self.throttle = Throttle(
+                bucket=self.__api_limit_bucket(conf.apiLimitInterval),
+                controller=AIMDController(maximum=conf.maxConcurrency))
+
+    def __api_limit_bucket(self, interval):
+        try:
+            api_limit = self.marvinRequest(new_command('getApiLimit'), response_type=new_response('getApiLimit'))
+        except Exception, e:
+            self.log.info("No api limit available, only adapting concurrency: %s" % e)
+            return None
+        from csapi.throttle import Throttle
+        return Throttle.bucket_from_api_limit(api_limit, interval=interval)
+
+    def close(self):
+        """Stops the background threads of this connection and closes its pooled connections."""
+        if self.endpoints is not None:
+            self.endpoints.close()
+        if self.hedge_executor is not None:
+            self.hedge_executor.shutdown(wait=False)
+        self.transport.close()
+
+    def post(self, url, data=None, **kwargs):
+        start = time.time()
+        result = self.transport.post(url, data=dict(data), **kwargs)
+        if self.tracer is not None and self.tracer.wants(data.get('command')):
+            from csapi.trace import redact
+            # no response body, these are the login and api key discovery calls
+            self.tracer.record(dict(
+                command=data.get('command'), method='POST', url=url, params=redact(data),
+                status=result.status_code, latency=time.time() - start))
+        result.raise_for_status()
+        return result
+
+    def marvinRequest(self, cmd, *args, **kwargs):
+        command = cmd.__class__.__name__.replace("Cmd", "")
+        start = time.time()
+        try:
+            return super(CSConnection, self).marvinRequest(cmd, *args, **kwargs)
+        finally:
+            self.metrics.record(command, TOTAL, time.time() - start)
+
+    def __sendPostReqToCS(self, url, payload):
+        return self.__send('POST', url, payload)
+
+    def __sendGetReqToCS(self, url, payload):
+        return self.__send('GET', url, payload)
+
+    def __send(self, method, url, payload, **options):
+        """Sends a signed marvin request through the pooled transport.
+
+        Mirrors marvin's own behavior of returning FAILED rather than raising,
+        leaving the cause in __lastError.
+        """
+        kwargs = dict(params=payload, verify=self.httpsFlag)
+        if self.certCAPath != 'NA' and self.certPath != 'NA':
+            kwargs['cert'] = (self.certCAPath, self.certPath)
+        kwargs.update(options)
+        start = time.time()
+        try:
+            response = self.__balanced_request(method, url, **kwargs)
+            if response.status_code == 401 and self.__cached_keys:
+                self.log.info("Cached api keys were rejected, discovering new ones")
+                self.__refresh_api_keys()
+                payload.pop('signature', None)
+                payload['signature'] = self.__sign(payload)
+                response = self.__balanced_request(method, url, **kwargs)
+        except Exception, e:
+            self.__trace(method, url, payload, start, error=e)
+            self.metrics.record_error(payload.get('command'), e.__class__.__name__)
+            self.__lastError = e
+            self.log.exception("%s to %s failed: %s" % (method, url, e))
+            return FAILED
+        streamed = options.get('stream', False)
+        self.__trace(method, url, payload, start, response=response, streamed=streamed)
+        self.__measure(payload, response, streamed)
+        return response
+
+    def __measure(self, payload, response, streamed):
+        command = payload.get('command')
+        if response.status_code >= 400:
+            self.metrics.record_error(command, "HTTP %dxx" % (response.status_code / 100))
+        response_bytes = response.headers.get('Content-Length')
+        if response_bytes is not None:
+            response_bytes = int(response_bytes)
+        elif not streamed:
+            response_bytes = len(response.content)
+        request_bytes = 0
+        for key, value in payload.iteritems():
+            if not isinstance(value, basestring):
+                value = str(value)
+            request_bytes += len(key) + len(value) + 2
+        self.metrics.record_bytes(command, request_bytes=request_bytes, response_bytes=response_bytes or 0)
+
+    def __trace(self, method, url, payload, start, response=None, error=None, streamed=False):
+        if self.tracer is None or not self.tracer.wants(payload.get('command')):
+            return
+        from csapi.trace import redact
+        event = dict(command=payload.get('command'), method=method, url=url, params=redact(payload),
+                     latency=time.time() - start)
+        if response is not None:
+            event['status'] = response.status_code
+            if not streamed:
+                event['body'] = response.text
+        if error is not None:
+            event['error'] = repr(error)
+        self.tracer.record(event)
+
+    def __sanitizeCmd(self, cmd):
+        """Turns a marvin command object into its name, async flag and payload.
+
+        Same result as marvin's version, but reads the instance __dict__
+        instead of walking dir(cmd).
+        """
+        cmd_name = cmd.__class__.__name__.replace("Cmd", "").strip()
+        _signer.prepare(cmd_name, cmd.__class__)
+        fields = cmd.__dict__
+        for required_param in fields.get('required', []):
+            if fields.get(required_param) is None:
+                self.__lastError = CloudstackAPIException(
+                    cmd_name, "parameter %s is required" % required_param)
+                return FAILED
+        payload = {}
+        for param, value in fields.iteritems():
+            if value is None or param == 'isAsync' or param == 'required':
+                continue
+            if isinstance(value, list):
+                if len(value) == 0:
+                    continue
+                if not isinstance(value[0], dict):
+                    payload[param] = ",".join(value)
+                else:
+                    for i, val in enumerate(value):
+                        for k, v in val.iteritems():
+                            payload["%s[%d].%s" % (param, i, k)] = v
+            else:
+                payload[param] = value
+        return cmd_name, fields.get('isAsync', "false"), payload
+
+    def __sign(self, payload):
+        payload["apiKey"] = self.apiKey
+        return _signer.sign(payload, self.securityKey)
+
+    def stream(self, cmd, response_type=None, method="GET"):
+        """Sends a list command, yielding each result as soon as it is parsed.
+
+        Unlike marvinRequest this asks for an XML response and parses it
+        incrementally, so the response is never held in memory as a whole.
+
+        :type cmd: object
+        :type response_type: object
+        :rtype: collections.Iterator[Struct]
+        """
+        from csapi.streaming import iter_results, error_text
+        sanitized = self.__sanitizeCmd(cmd)
+        if sanitized == FAILED:
+            raise self.__lastError
+        cmd_name, is_async, payload = sanitized
+        payload['command'] = cmd_name
+        payload['response'] = 'xml'
+        payload['signature'] = self.__sign(payload)
+        start = time.time()
+        response = self.__send(method, self.baseUrl, payload, stream=True)
+        if response == FAILED:
+            raise self.__lastError
+        try:
+            if response.status_code != 200:
+                raise CloudstackAPIException(cmd_name, error_text(response.text))
+            response.raw.decode_content = True
+            for result in iter_results(response.raw, response_type):
+                yield result
+        finally:
+            response.close()
+            self.metrics.record(cmd_name, TOTAL, time.time() - start)
+
+    def __balanced_request(self, method, url, **kwargs):
+        """Sends a request to one of the endpoints, failing over to the others.
+
+        Requests stopped by an open circuit and failures to connect fail over,
+        since those never reached a server. Other connection errors only fail
+        over for idempotent commands. Each endpoint has its own circuit breaker.
+        """
+        if self.endpoints is None:
+            return self.__resilient_request(method, url, **kwargs)
+        idempotent = is_idempotent(kwargs['params'].get('command', ''))
+        tried = []
+        error = None
+        while True:
+            endpoint = self.endpoints.select(exclude=tried)
+            if endpoint is None:
+                raise error
+            tried.append(endpoint)
+            start = time.time()
+            try:
+                response = self.__resilient_request(method, endpoint.url, **kwargs)
+            except (requests.ConnectionError, CircuitOpenException), error:
+                self.endpoints.release(endpoint, time.time() - start, failed=True)
+                if not (idempotent or isinstance(error, CircuitOpenException) or _never_sent(error)):
+                    raise
+                self.log.info("Request to %s failed, failing over: %s" % (endpoint.url, error))
+                continue
+            except Exception:
+                self.endpoints.release(endpoint, time.time() - start)
+                raise
+            # cloudstack answers 530 for plain api errors, only gateway errors mean the server is in trouble
+            self.endpoints.release(endpoint, time.time() - start, failed=response.status_code in GATEWAY_ERRORS)
+            return response
+
+    def __breaker(self, url):
+        """:rtype: CircuitBreaker"""
+        with self.__breakers_lock:
+            breaker = self.__breakers.get(url)
+            if breaker is None:
+                breaker = CircuitBreaker(url)
+                self.__breakers[url] = breaker
+            return breaker
+
+    def __resilient_request(self, method, url, **kwargs):
+        """Sends a request, retrying transient failures of idempotent commands.
+
+        Every endpoint has a circuit breaker that fails requests fast once the
+        endpoint keeps failing. Slow list calls may be hedged.
+        """
+        command = kwargs['params'].get('command', '')
+        policy = self.retry_policy
+        attempts = policy.attempts_for(command)
+        breaker = self.__breaker(url)
+        hedge = (self.hedge_executor is not None and command.startswith('list')
+                 and not kwargs.get('stream', False))
+        for attempt in xrange(attempts):
+            last_attempt = attempt + 1 == attempts
+            breaker.allow()
+            # api errors and anything unrelated to the endpoint leave the outcome None
+            success = None
+            error = None
+            try:
+                try:
+                    if hedge:
+                        response = self.__hedged_request(command, method, url, **kwargs)
+                    else:
+                        response = self.__throttled_request(method, url, **kwargs)
+                except (requests.ConnectionError, requests.Timeout), error:
+                    success = False
+                    if last_attempt:
+                        raise
+                else:
+                    success = response.status_code not in GATEWAY_ERRORS
+            finally:
+                breaker.record(success)
+            if error is not None:
+                self.log.debug("%s failed, retrying: %s" % (command, error))
+                time.sleep(policy.delay(attempt))
+                continue
+            if response.status_code in policy.retry_status_codes and not last_attempt:
+                self.log.debug("%s got %d, retrying" % (command, response.status_code))
+                response.close()
+                time.sleep(policy.delay(attempt))
+                continue
+            return response
+
+    def __hedged_request(self, command, method, url, **kwargs):
+        """Sends a duplicate request when the request is slower than the p95.
+
+        The request itself is sent from the calling thread, so the hedge
+        executor never limits how many list calls are in flight, and only
+        hedges can queue for its workers. The hedge's response is used when
+        the request itself fails.
+        """
+        tracker = self.__latencies.get(command)
+        if tracker is None:
+            tracker = self.__latencies.setdefault(command, LatencyTracker())
+        delay = tracker.percentile(95)
+        start = time.time()
+        if delay is None:
+            response = self.__throttled_request(method, url, **kwargs)
+            tracker.record(time.time() - start)
+            return response
+        finished = threading.Event()
+        hedged = self.hedge_executor.submit(self.__hedge, finished, start + delay, command, method, url, **kwargs)
+        try:
+            response = self.__throttled_request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            exc_info = sys.exc_info()
+            finished.set()
+            response = self.__hedge_response(hedged)
+            if response is None:
+                raise exc_info[0], exc_info[1], exc_info[2]
+        else:
+            finished.set()
+            if response.status_code in GATEWAY_ERRORS:
+                hedge_response = self.__hedge_response(hedged)
+                if hedge_response is not None and hedge_response.status_code not in GATEWAY_ERRORS:
+                    response.close()
+                    response = hedge_response
+                elif hedge_response is not None:
+                    hedge_response.close()
+            else:
+                hedged.add_done_callback(_close_response)
+        tracker.record(time.time() - start)
+        return response
+
+    def __hedge(self, finished, at, command, method, url, **kwargs):
+        """Sends a duplicate of a request unless it finishes before time at, returns None if it did."""
+        if finished.wait(max(0.0, at - time.time())):
+            return None
+        self.log.debug("%s slower than the p95, sending hedged request" % command)
+        return self.__throttled_request(method, url, **kwargs)
+
+    @staticmethod
+    def __hedge_response(hedged):
+        """The response of a hedge, or None if it was not sent or failed."""
+        try:
+            return hedged.result()
+        except Exception:
+            return None
+
+    def __throttled_request(self, method, url, **kwargs):
+        command = kwargs['params'].get('command')
+        queued = 0
+        if self.throttle is not None:
+            queued = self.throttle.acquire()
+        start = time.time()
+        status_code = None
+        unreachable = False
+        try:
+            response = self.transport.request(method, url, **kwargs)
+            status_code = response.status_code
+            return response
+        except (requests.ConnectionError, requests.Timeout):
+            unreachable = True
+            raise
+        finally:
+            latency = time.time() - start
+            if self.throttle is not None:
+                self.throttle.release(latency, status_code, unreachable=unreachable)
+            self.metrics.record(command, QUEUE, queued)
+            self.metrics.record(command, NETWORK, latency)
+
+    def __poll(self, jobid, response_cmd):
+        """Waits for an async job through the shared job poller.
+
+        Like marvin's own __poll this returns FAILED rather than raising, with
+        the cause left in __lastError for marvinRequest to raise.
+        """
+        command = response_cmd.__class__.__name__.replace("Response", "")
+        start = time.time()
+        try:
+            future = self.job_poller.submit(jobid, response_cmd, self.asyncTimeout)
+            # the poller fails the job at its deadline, at the latest one poll interval late
+            return future.result(timeout=self.asyncTimeout + 2 * self.job_poller.max_interval)
+        except Exception, e:
+            self.metrics.record_error(command, e.__class__.__name__)
+            self.__lastError = e
+            self.log.debug("Async job %s failed: %s" % (jobid, e))
+            return FAILED
+        finally:
+            self.metrics.record(command, POLLING, time.time() - start)
+
+    @staticmethod
+    def __get_session_id(r):
+        cookies = r.headers['Set-cookie']
+        match_obj = re.match(r'.*?JSESSIONID=(.+);.*', cookies, re.M | re.I)
+        if match_obj is None:
+            raise CloudstackAPIException("Login failed, no JSESSIONID cookie found in response")
+        session_id = match_obj.group(1)
+        return session_id
+
+    def __login(self, details):
+        url = details.baseUrl + '?login'
+        payload = Struct(
+            command='login',
+            username=details.user,
+            password=details.password,
+            domain=details.domain
+        )
+        r = self.post(url, data=payload)
+        session_id = self.__get_session_id(r)
+        doc = ET.fromstring(r.text)
+        session_key = doc.findtext('.//sessionkey')
+        if session_key is None:
+            raise CloudstackAPIException(
+                "Login failed, no <sessionkey/> found in response")
+        user_id = doc.findtext('.//userid')
+        if user_id is None:
+            raise CloudstackAPIException(
+                "Login failed, no <userid/> found in response")
+
+        session = dict(sessionId=session_id, sessionKey=session_key, userId=user_id,
+                       cookies=dict(JSESSIONID=session_id))
+        session = namedtuple('Session', session.keys())(*session.values())
+        return session
+
+    def __get_existing_api_keys(self, details, session):
+        payload = Struct(
+            command='listUsers',
+            id=session.userId,
+            sessionkey=session.sessionKey
+        )
+        try:
+            r = self.post(details.baseUrl, data=payload, cookies=session.cookies)
+        except requests.HTTPError, e:
+            if not hasattr(e, 'response'):
+                raise
+            response = e.response
+            if not hasattr(response, 'status_code'):
+                raise
+            status_code = response.status_code
+            if status_code == 401:
+                print "__get_existing_api_keys() got 401 on listUsers, returning None"
+                return None, None
+            else:
+                raise
+        doc = ET.fromstring(r.text)
+        api_key = doc.findtext('.//apikey')
+        secret_key = doc.findtext('.//secretkey')
+        return api_key, secret_key  # both can be None
+
+    def __register_api_keys(self, details, session):
+        payload = Struct(
+            command='registerUserKeys',
+            id=session.userId,
+            sessionkey=session.sessionKey
+        )
+        r = self.post(details.baseUrl, data=payload, cookies=session.cookies)
+        doc = ET.fromstring(r.text)
+        api_key = doc.findtext('.//apikey')
+        secret_key = doc.findtext('.//secretkey')
+        return api_key, secret_key  # both can be None
+
+    def __find_api_keys(self, details):
+        if details.apiKey is not None and details.securityKey is not None:
+            return
+
+        cache = self.credential_cache
+        if cache is not None:
+            api_key, secret_key = cache.get(details.baseUrl, details.user, details.domain)
+            if api_key is not None and secret_key is not None:
+                self.log.debug("Using cached api keys for %s" % details.user)
+                self.__cached_keys = True
+                details.apiKey = api_key
+                details.secretKey = secret_key
+                details.securityKey = secret_key
+                return
+
+        session = self.__login(details)
+        api_key, secret_key = self.__get_existing_api_keys(details, session)
+        if api_key is None or secret_key is None:
+            api_key, secret_key = self.__register_api_keys(details, session)
+            if api_key is None or secret_key is None:
+                raise CloudstackAPIException(
+                    "Key registration failed, no <apikey/> or <secretkey/> found in response")
+
+        details.apiKey = api_key
+        details.secretKey = secret_key
+        details.securityKey = secret_key  # kill me now
+        if cache is not None:
+            cache.put(details.baseUrl, details.user, details.domain, api_key, secret_key)
+
+    def __refresh_api_keys(self):
+        """Drops cached api keys that the server rejected and discovers new ones."""
+        details = self.__details
+        self.credential_cache.invalidate(details.baseUrl, details.user, details.domain)
+        self.__cached_keys = False
+        details.apiKey = None
+        details.securityKey = None
+        self.__find_api_keys(details)
+        self.apiKey = details.apiKey
+        self.securityKey = details.securityKey
+
@@ -0,0 +1,143 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Copying attributes between results, commands and models.
+
+Every row of every list response is converted, so the type checks and
+field lookups are done once per (source type, target type) by a Converter
+instead of on every call.
+"""
+
+from itertools import imap
+from collections import Mapping
+
+from csapi.model import Struct
+
+_converters = {}
+
+
+def _identity(value):
+    return value
+
+
+def _data_descriptors(cls):
+    names = set()
+    if not isinstance(cls, type):
+        # old-style classes, as marvin's are, do not call descriptors on assignment
+        return names
+    for klass in cls.__mro__:
+        for name, attr in vars(klass).iteritems():
+            if hasattr(attr, '__set__'):
+                names.add(name)
+    return names
+
+
+class Converter(object):
+    """Copies attributes of source_type objects onto target_type objects.
+
+    With set_all every attribute of the source is copied. Otherwise only the
+    fields that a new target_type object starts out with are, so the target
+    type should set all its fields in its constructor, as marvin commands
+    and the models do.
+    """
+
+    def __init__(self, source_type, target_type, set_all, target):
+        """
+        :type source_type: type
+        :type target_type: type
+        :type set_all: bool
+        :param target: a target_type object, for the field list if target_type cannot
+            be constructed without arguments
+        """
+        self.set_all = set_all
+        if issubclass(source_type, Struct) or not issubclass(source_type, Mapping):
+            # a Struct is a mapping over its __dict__, which is much faster to read directly
+            self._read = vars
+        else:
+            self._read = _identity
+        # assigning to __dict__ is only the same as setattr without __setattr__ or data descriptors
+        self._direct = (getattr(target_type, '__setattr__', object.__setattr__) is object.__setattr__ and
+                        hasattr(target, '__dict__'))
+        self._descriptors = _data_descriptors(target_type)
+        self.fields = None
+        if not set_all:
+            try:
+                prototype = target_type()
+            except TypeError:
+                prototype = target
+            self.fields = tuple([k for k, v in vars(prototype).iteritems() if not callable(v)])
+            self._direct = self._direct and self._descriptors.isdisjoint(self.fields)
+
+    def __call__(self, target, source):
+        values = self._read(source)
+        if self.fields is not None:
+            if self._direct:
+                target.__dict__.update([(k, values[k]) for k in self.fields if k in values])
+            else:
+                for k in self.fields:
+                    if k in values:
+                        setattr(target, k, values[k])
+            return target
+        if any(imap(callable, values.itervalues())):
+            values = dict([(k, v) for k, v in values.iteritems() if not callable(v)])
+        if self._direct and self._descriptors.isdisjoint(values):
+            target.__dict__.update(values)
+        else:
+            for k, v in values.iteritems():
+                setattr(target, k, v)
+        return target
+
+
+def converter(source, target, set_all=False):
+    """The Converter from the class of source to the class of target, compiled on first use.
+
+    Classes are taken from __class__ rather than type(), which is the same for
+    all instances of old-style classes.
+
+    :type source: object
+    :type target: object
+    :type set_all: bool
+    :rtype: Converter
+    """
+    key = (source.__class__, target.__class__, set_all)
+    result = _converters.get(key)
+    if result is None:
+        result = _converters.setdefault(key, Converter(key[0], key[1], set_all, target))
+    return result
+
+
+def copy_to_object(obj, d, set_all=False):
+    """Utility function to apply dict-like objects onto object properties.
+
+    :type obj: object
+    :type d: object | dict
+    :type set_all: bool
+    """
+    return converter(d, obj, set_all)(obj, d)
+
+
+def new_object(constructor, d, set_all=False):
+    """
+    Utility function to apply dict-like objects onto new instance of a type.
+
+    :type constructor: callable
+    :type d: object
+    :type set_all: bool
+    """
+    result = constructor()
+    converter(d, result, set_all)(result, d)
+    return result
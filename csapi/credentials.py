@@ -0,0 +1,107 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""On-disk cache of discovered api keys."""
+
+import os
+import stat
+import json
+import tempfile
+import threading
+import logging
+
+logger = logging.getLogger("csapi.credentials")
+
+DEFAULT_PATH = os.path.join('~', '.cstest', 'credentials.json')
+
+
+class CredentialCache(object):
+    """Remembers the api and secret key per base url, user and domain.
+
+    The file and its directory are only accessible by the current user, a
+    cache file that is readable by anyone else is ignored. Writes go through
+    a temporary file and a rename so concurrent processes never see a partial
+    file. The cache is best-effort: a cache that cannot be written is logged
+    and otherwise ignored.
+    """
+
+    def __init__(self, path=None):
+        """:type path: str"""
+        if path is None:
+            path = DEFAULT_PATH
+        self.path = os.path.expanduser(path)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(base_url, user, domain):
+        return "%s|%s|%s" % (base_url, user, domain or '')
+
+    def get(self, base_url, user, domain):
+        """:rtype: (str, str)"""
+        with self._lock:
+            entry = self.__load().get(self.key(base_url, user, domain))
+        if entry is None or entry.get('apikey') is None or entry.get('secretkey') is None:
+            return None, None
+        # json gives back unicode, but hmac signing wants byte strings
+        return str(entry['apikey']), str(entry['secretkey'])
+
+    def put(self, base_url, user, domain, api_key, secret_key):
+        with self._lock:
+            entries = self.__load()
+            entries[self.key(base_url, user, domain)] = dict(apikey=api_key, secretkey=secret_key)
+            self.__save(entries)
+
+    def invalidate(self, base_url, user, domain):
+        with self._lock:
+            entries = self.__load()
+            if entries.pop(self.key(base_url, user, domain), None) is not None:
+                self.__save(entries)
+
+    def __load(self):
+        try:
+            mode = os.stat(self.path).st_mode
+        except OSError:
+            return {}
+        if mode & (stat.S_IRWXG | stat.S_IRWXO):
+            logger.warn("Ignoring credential cache %s, it is accessible by other users" % self.path)
+            return {}
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (IOError, ValueError), e:
+            logger.warn("Ignoring unreadable credential cache %s: %s" % (self.path, e))
+            return {}
+
+    def __save(self, entries):
+        try:
+            self.__write(entries)
+        except (IOError, OSError), e:
+            logger.warn("Could not write credential cache %s: %s" % (self.path, e))
+
+    def __write(self, entries):
+        directory = os.path.dirname(self.path) or '.'
+        if not os.path.isdir(directory):
+            os.makedirs(directory, 0700)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.credentials')
+        try:
+            # mkstemp already creates the file as 0600
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entries, f)
+            os.rename(tmp_path, self.path)
+        except:
+            os.unlink(tmp_path)
+            raise
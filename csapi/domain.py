@@ -15,73 +15,69 @@
 # specific language governing permissions and limitations
 # under the License.
 
-from marvin.cloudstackAPI.createDomain import createDomainCmd
-from marvin.cloudstackAPI.updateDomain import updateDomainCmd
-from marvin.cloudstackAPI.listDomains import listDomainsCmd
-from marvin.cloudstackAPI.deleteDomain import deleteDomainCmd
+import sys
+import copy
+import weakref
+from functools import partial
 
-from apiclient import CloudStackObjectAPI, copy_to_object, new_object
-from apiclient import CloudstackNoResultsException, CloudstackAPIFailureException, CloudstackMultipleResultsException
+from apiclient import CloudStackObjectAPI
+from csapi.batch import CREATE_CONCURRENCY, pipeline
+from csapi.futures import Future
 from csapi.model import Domain
 
 
 class DomainAPI(CloudStackObjectAPI):
-    def create(self, domain):
-        """:type domain: Domain"""
-        cmd = new_object(createDomainCmd, domain)
-        created = self.api_client().createDomain(cmd, method="POST")
-        return new_object(Domain, created, set_all=True)
+    model = Domain
+    list_command = 'listDomains'
+    cache_group = 'Domain'
+    invalidates = ['Domain', 'Account', 'User']
 
-    def update(self, domain):
-        """:type domain: Domain"""
-        cmd = new_object(updateDomainCmd, domain)
-        updated = self.api_client().updateDomain(cmd, method="POST")
-        return new_object(Domain, updated, set_all=True)
+    def create_many(self, domains, max_concurrency=CREATE_CONCURRENCY):
+        """Creates domains, max_concurrency at a time, yielding a BatchResult for each as it is done.
 
-    def delete(self, domain):
-        """:type domain: Domain|int"""
-        if isinstance(domain, int):
-            domain_id = domain
-        else:
-            domain_id = domain.id
-        cmd = deleteDomainCmd()
-        cmd.id = domain_id
-        result = self.api_client().deleteDomain(cmd, method="POST")
-        if not result.success:
-            raise CloudstackAPIFailureException(
-                "deletion failed for id %s" % domain_id)
+        The parentdomainid of a domain may be one of the Domain instances that
+        come before it in domains, it is then created once its parent has been.
+        A domain whose parent fails, or comes after it, fails too.
+        domains can be any iterable, it is consumed as creations complete.
 
-    def delete_all(self, *args):
-        """:type *args: list[Domain]"""
-        cmd = listDomainsCmd()
-        cmd.listall = True
-        results = self.api_client().listDomains(cmd)
-        for domain in args:
-            for result in results:
-                if domain.name == result.name:
-                    self.delete(result)
+        :type domains: collections.Iterable[Domain]
+        :type max_concurrency: int
+        :rtype: collections.Iterator[csapi.batch.BatchResult]
+        """
+        api = self.bound()
+        # input domain id -> (weak reference to the input domain, future of the created domain).
+        # Entries go once the input domain is garbage, when no later domain can name it as parent.
+        pending = {}
 
-    def list(self, **kwargs):
-        """:rtype: collections.Sequence[Domain]"""
-        cmd = listDomainsCmd()
-        copy_to_object(cmd, kwargs)
-        results = self.api_client().listDomains(cmd)
-        if results is None:
-            return []
-        return list([new_object(Domain, a, set_all=True) for a in results])
+        def tasks():
+            for domain in domains:
+                parent = domain.parentdomainid
+                parent_created = None
+                if isinstance(parent, Domain):
+                    parent_created = pending.get(id(parent), (None, None))[1]
+                    if parent_created is None:
+                        parent_created = Future()
+                        if parent.id is not None:
+                            parent_created.set_result(parent)
+                        else:
+                            parent_created.set_exception(ValueError(
+                                "Parent %s of domain %s should be created before it" % (parent.name, domain.name)))
+                created = Future()
+                key = id(domain)
+                pending[key] = (weakref.ref(domain, lambda ref, key=key: pending.pop(key, None)), created)
+                yield domain, partial(self.__create_after, api, domain, parent_created, created)
+        return pipeline(tasks(), max_concurrency=max_concurrency)
 
-    def find(self, **kwargs):
-        """:rtype: Domain"""
-        if not 'listall' in kwargs:
-            kwargs = dict(kwargs)
-            kwargs['listall'] = True
-        results = self.list(**kwargs)
-        matches = len(results)
-        if matches == 0:
-            raise CloudstackNoResultsException(
-                "No results found matching %s" % repr(kwargs))
-        elif matches == 1:
-            return results[0]
-        else:
-            raise CloudstackMultipleResultsException(
-                "%s results found matching %s" % (matches, repr(kwargs)))
+    @staticmethod
+    def __create_after(api, domain, parent_created, created):
+        try:
+            if parent_created is not None:
+                # tasks start in submission order, so the parent is at least being created by now
+                domain = copy.copy(domain)
+                domain.parentdomainid = parent_created.result().id
+            result = api.create(domain)
+        except BaseException:
+            created.set_exc_info(sys.exc_info())
+            raise
+        created.set_result(result)
+        return result
@@ -0,0 +1,171 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Spreading requests over several management servers."""
+
+import random
+import threading
+import logging
+import weakref
+
+logger = logging.getLogger("csapi.endpoints")
+
+LEAST_OUTSTANDING = 'least-outstanding'
+LATENCY = 'latency'
+STRATEGIES = [LEAST_OUTSTANDING, LATENCY]
+
+
+def parse_urls(base_url):
+    """Splits a comma-separated list of base urls.
+
+    :type base_url: str
+    :rtype: list[str]
+    """
+    return [url.strip() for url in base_url.split(',') if url.strip()]
+
+
+class Endpoint(object):
+    """One management server and what we know about how it is doing."""
+
+    def __init__(self, url, smoothing=0.2):
+        """
+        :type url: str
+        :type smoothing: float
+        """
+        self.url = url
+        self.smoothing = smoothing
+        self.healthy = True
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.latency = None
+
+    def to_dict(self):
+        """:rtype: dict"""
+        return dict(url=self.url, healthy=self.healthy, outstanding=self.outstanding,
+                    requests=self.requests, failures=self.failures, latency=self.latency)
+
+
+class EndpointPool(object):
+    """Picks a management server for each request.
+
+    The least-outstanding strategy sends a request to the server with the
+    fewest requests in flight. The latency strategy also weighs in how fast
+    each server has been answering, preferring the lowest expected wait of
+    (outstanding + 1) * latency. Ties are broken randomly.
+
+    A server that fails a request is marked down and skipped while others are
+    up. Every health_check_interval seconds servers that are down are checked
+    with check(url), and marked up again once that returns True. Health checks
+    stop when the pool is closed, or once owner has been garbage collected.
+    """
+
+    def __init__(self, urls, strategy=LEAST_OUTSTANDING, check=None, health_check_interval=10.0, owner=None):
+        """
+        :type urls: list[str]
+        :type strategy: str
+        :type check: (str) -> bool
+        :type health_check_interval: float
+        :param owner: the object using the pool, only weakly referenced
+        """
+        if not urls:
+            raise ValueError("At least one endpoint is needed")
+        if strategy not in STRATEGIES:
+            raise ValueError("Endpoint strategy should be one of %s, not %s" % (STRATEGIES, strategy))
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.strategy = strategy
+        self.check = check
+        self.health_check_interval = health_check_interval
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._owner = None
+        if owner is not None:
+            self._owner = weakref.ref(owner, self.__owner_gone)
+        self._thread = None
+        if check is not None:
+            self._thread = threading.Thread(target=self.__run, name="csapi-health-check")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def __score(self, endpoint):
+        if self.strategy == LATENCY and endpoint.latency is not None:
+            return (endpoint.outstanding + 1) * endpoint.latency
+        return endpoint.outstanding
+
+    def select(self, exclude=()):
+        """Picks the best endpoint not in exclude, preferring healthy ones.
+
+        Returns None once every endpoint has been excluded.
+
+        :type exclude: collections.Container[Endpoint]
+        :rtype: Endpoint|None
+        """
+        with self._lock:
+            candidates = [e for e in self.endpoints if e not in exclude]
+            if not candidates:
+                return None
+            healthy = [e for e in candidates if e.healthy]
+            if healthy:
+                candidates = healthy
+            best = min([self.__score(e) for e in candidates])
+            endpoint = random.choice([e for e in candidates if self.__score(e) == best])
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def release(self, endpoint, latency, failed=False):
+        """Reports the outcome of a request sent to a selected endpoint.
+
+        :type endpoint: Endpoint
+        :type latency: float
+        :type failed: bool
+        """
+        with self._lock:
+            endpoint.outstanding -= 1
+            if failed:
+                endpoint.failures += 1
+                if endpoint.healthy:
+                    logger.warn("Marking endpoint %s down" % endpoint.url)
+                endpoint.healthy = False
+            elif endpoint.latency is None:
+                endpoint.latency = latency
+            else:
+                endpoint.latency += endpoint.smoothing * (latency - endpoint.latency)
+
+    def stats(self):
+        """:rtype: list[dict]"""
+        with self._lock:
+            return [e.to_dict() for e in self.endpoints]
+
+    def close(self):
+        self._closed.set()
+
+    def __owner_gone(self, ref):
+        self.close()
+
+    def __run(self):
+        while not self._closed.wait(self.health_check_interval):
+            for endpoint in [e for e in self.endpoints if not e.healthy]:
+                try:
+                    healthy = self.check(endpoint.url)
+                except Exception, e:
+                    logger.debug("Health check of %s failed: %s" % (endpoint.url, e))
+                    healthy = False
+                if healthy:
+                    logger.info("Marking endpoint %s up" % endpoint.url)
+                    with self._lock:
+                        endpoint.healthy = True
@@ -0,0 +1,212 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Minimal futures and a bounded worker pool.
+
+python 2.7 has neither asyncio nor concurrent.futures, so this provides just
+enough of the concurrent.futures API for the csapi concurrency helpers.
+"""
+
+import os
+import sys
+import threading
+import logging
+import Queue
+
+logger = logging.getLogger("csapi.futures")
+
+
+class TimeoutError(Exception):
+    pass
+
+
+class Future(object):
+    """Result of an operation that may not have completed yet."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._done = False
+        self._result = None
+        self._exc_info = None
+        self._callbacks = []
+
+    def done(self):
+        return self._done
+
+    def succeeded(self):
+        """:rtype: bool"""
+        return self._done and self._exc_info is None
+
+    def wait(self, timeout=None):
+        """:rtype: bool"""
+        with self._condition:
+            if not self._done:
+                self._condition.wait(timeout)
+            return self._done
+
+    def result(self, timeout=None):
+        if not self.wait(timeout):
+            raise TimeoutError("Future did not complete within %s seconds" % timeout)
+        if self._exc_info is not None:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._result
+
+    def exception(self, timeout=None):
+        if not self.wait(timeout):
+            raise TimeoutError("Future did not complete within %s seconds" % timeout)
+        if self._exc_info is not None:
+            return self._exc_info[1]
+        return None
+
+    def add_done_callback(self, fn):
+        """Calls fn(future) once done, immediately if already done."""
+        with self._condition:
+            if not self._done:
+                self._callbacks.append(fn)
+                return
+        self.__invoke(fn)
+
+    def set_result(self, result):
+        self.__complete(result, None)
+
+    def set_exception(self, exception):
+        self.__complete(None, (type(exception), exception, None))
+
+    def set_exc_info(self, exc_info):
+        self.__complete(None, exc_info)
+
+    def __complete(self, result, exc_info):
+        with self._condition:
+            if self._done:
+                return
+            self._result = result
+            self._exc_info = exc_info
+            self._done = True
+            callbacks = self._callbacks
+            self._callbacks = []
+            self._condition.notify_all()
+        for fn in callbacks:
+            self.__invoke(fn)
+
+    def __invoke(self, fn):
+        try:
+            fn(self)
+        except Exception:
+            logger.exception("Exception in done callback of %s" % self)
+
+
+class Executor(object):
+    """Runs submitted calls on at most max_workers daemon threads."""
+
+    def __init__(self, max_workers=16, name='csapi-worker'):
+        """
+        :type max_workers: int
+        :type name: str
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers should be at least 1")
+        self.max_workers = max_workers
+        self.name = name
+        self._queue = Queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._shutdown = False
+
+    def submit(self, fn, *args, **kwargs):
+        """:rtype: Future"""
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("Cannot submit to an executor that was shut down")
+            self._queue.put((future, fn, args, kwargs))
+            if len(self._threads) < self.max_workers:
+                thread = threading.Thread(
+                    target=self.__work, name="%s-%d" % (self.name, len(self._threads)))
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+        return future
+
+    def map(self, fn, iterable):
+        """:rtype: list[Future]"""
+        return [self.submit(fn, item) for item in iterable]
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+            for _ in self._threads:
+                self._queue.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def __work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            future, fn, args, kwargs = item
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                future.set_exc_info(sys.exc_info())
+            else:
+                future.set_result(result)
+
+
+_default_executor = None
+_default_executor_lock = threading.Lock()
+
+
+def default_executor():
+    """Process-wide executor, sized by CS_MAX_WORKERS (default 64).
+
+    :rtype: Executor
+    """
+    global _default_executor
+    with _default_executor_lock:
+        if _default_executor is None:
+            max_workers = int(os.environ.get('CS_MAX_WORKERS', '64'))
+            _default_executor = Executor(max_workers=max_workers, name='csapi-default')
+        return _default_executor
+
+
+def as_completed(futures, timeout=None):
+    """Yields futures in the order they complete."""
+    futures = list(futures)
+    completed = Queue.Queue()
+    for future in futures:
+        future.add_done_callback(completed.put)
+    for _ in xrange(len(futures)):
+        try:
+            yield completed.get(timeout=timeout)
+        except Queue.Empty:
+            raise TimeoutError("Futures did not complete within %s seconds" % timeout)
+
+
+def wait_all(futures, timeout=None):
+    """Waits for all futures and returns them.
+
+    :rtype: list[Future]
+    """
+    futures = list(futures)
+    for future in futures:
+        if not future.wait(timeout):
+            raise TimeoutError("Futures did not complete within %s seconds" % timeout)
+    return futures
@@ -0,0 +1,195 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Shared poller for asynchronous cloudstack jobs."""
+
+import sys
+import time
+import threading
+import logging
+from collections import deque
+
+from marvin.cloudstackException import CloudstackAPIException
+
+from csapi.futures import Future
+from csapi.commands import new_command, new_response
+
+logger = logging.getLogger("csapi.jobs")
+
+JOB_PENDING = 0
+JOB_SUCCEEDED = 1
+JOB_FAILED = 2
+
+# jobs are listed from this many seconds before the oldest tracked job, to allow for clock skew
+_clock_skew_margin = 300
+
+
+class _TrackedJob(object):
+    def __init__(self, jobid, response_type, timeout):
+        self.jobid = jobid
+        self.response_type = response_type
+        self.started = time.time()
+        self.deadline = self.started + timeout
+        self.future = Future()
+
+
+class JobPoller(object):
+    """Tracks all outstanding async jobs of a connection and polls them together.
+
+    Instead of one queryAsyncJobResult call per job every few seconds, a single
+    background thread lists the status of all tracked jobs with one
+    listAsyncJobs call, and only calls queryAsyncJobResult for jobs that have
+    finished, to fetch their typed result. Jobs that do not show up in the
+    listing are queried individually.
+
+    The polling interval adapts to how long jobs have been observed to take,
+    and backs off exponentially while nothing completes.
+    """
+
+    def __init__(self, connection, min_interval=0.5, max_interval=10.0, backoff=1.5, history=100):
+        """
+        :type connection: csapi.connection.CSConnection
+        :type min_interval: float
+        :type max_interval: float
+        :type backoff: float
+        :type history: int
+        """
+        self.connection = connection
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self._durations = deque(maxlen=history)
+        self._jobs = {}
+        self._idle_polls = 0
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def submit(self, jobid, response_type, timeout):
+        """Starts tracking jobid, returning a future for its result.
+
+        :type timeout: float
+        :rtype: csapi.futures.Future
+        """
+        job = _TrackedJob(jobid, response_type, timeout)
+        with self._condition:
+            self._jobs[jobid] = job
+            self._idle_polls = 0
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.__run, name="csapi-job-poller")
+                self._thread.daemon = True
+                self._thread.start()
+        return job.future
+
+    def outstanding(self):
+        """:rtype: int"""
+        with self._condition:
+            return len(self._jobs)
+
+    def interval(self):
+        """Seconds to wait before the next poll.
+
+        :rtype: float
+        """
+        if len(self._durations) == 0:
+            estimate = self.min_interval
+        else:
+            durations = sorted(self._durations)
+            estimate = durations[len(durations) // 2] / 4.0
+        estimate *= self.backoff ** self._idle_polls
+        return max(self.min_interval, min(self.max_interval, estimate))
+
+    def __run(self):
+        while True:
+            with self._condition:
+                if len(self._jobs) == 0:
+                    self._thread = None
+                    return
+                self._condition.wait(self.interval())
+                jobs = dict(self._jobs)
+            try:
+                self.__poll(jobs)
+            except Exception, e:
+                logger.warn("Polling %d async jobs failed: %s" % (len(jobs), e))
+                self._idle_polls += 1
+
+    def __poll(self, jobs):
+        try:
+            statuses = self.__list_job_statuses(min(job.started for job in jobs.itervalues()))
+        except Exception, e:
+            logger.debug("listAsyncJobs failed, querying %d jobs individually: %s" % (len(jobs), e))
+            statuses = {}
+        completed = 0
+        for jobid, job in jobs.iteritems():
+            if time.time() > job.deadline:
+                self.__resolve(job, exception=CloudstackAPIException(
+                    "queryAsyncJobResult", "job %s did not complete within %d seconds" % (
+                        jobid, job.deadline - job.started)))
+                continue
+            status = statuses.get(jobid)
+            if status is None or status != JOB_PENDING:
+                try:
+                    done = self.__query(job)
+                except Exception, e:
+                    # idempotent queries are retried below us, so this one is not going to work out
+                    logger.debug("queryAsyncJobResult for job %s failed: %s" % (jobid, e))
+                    self.__resolve(job, exc_info=sys.exc_info())
+                    done = True
+                if done:
+                    completed += 1
+        if completed > 0:
+            self._idle_polls = 0
+        else:
+            self._idle_polls += 1
+
+    def __list_job_statuses(self, since):
+        cmd = new_command('listAsyncJobs')
+        cmd.startdate = time.strftime('%Y-%m-%dT%H:%M:%S+0000', time.gmtime(since - _clock_skew_margin))
+        cmd.pagesize = max(500, 2 * len(self._jobs))
+        cmd.page = 1
+        results = self.connection.marvinRequest(cmd, response_type=new_response('listAsyncJobs'))
+        statuses = {}
+        for result in results or []:
+            statuses[result.jobid] = result.jobstatus
+        return statuses
+
+    def __query(self, job):
+        """Fetches the result of a job, returns True if the job is done."""
+        cmd = new_command('queryAsyncJobResult')
+        cmd.jobid = job.jobid
+        response = self.connection.marvinRequest(cmd, response_type=job.response_type)
+        status = getattr(response, 'jobstatus', None)
+        if status is None or status == JOB_PENDING:
+            return False
+        if status == JOB_FAILED:
+            job_result = getattr(response, 'jobresult', None)
+            error_text = getattr(job_result, 'errortext', None) or response
+            self.__resolve(job, exception=CloudstackAPIException(
+                "queryAsyncJobResult", "job %s failed: %s" % (job.jobid, error_text)))
+        else:
+            self.__resolve(job, result=response)
+        self._durations.append(time.time() - job.started)
+        return True
+
+    def __resolve(self, job, result=None, exception=None, exc_info=None):
+        with self._condition:
+            self._jobs.pop(job.jobid, None)
+        if exc_info is not None:
+            job.future.set_exc_info(exc_info)
+        elif exception is not None:
+            job.future.set_exception(exception)
+        else:
+            job.future.set_result(result)
@@ -0,0 +1,208 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Per-command latency histograms, byte counts and error counts."""
+
+import os
+import json
+import atexit
+import threading
+import logging
+
+logger = logging.getLogger("csapi.metrics")
+
+# the parts a call's latency is split into
+QUEUE = 'queue'
+NETWORK = 'network'
+POLLING = 'polling'
+TOTAL = 'total'
+PHASES = [QUEUE, NETWORK, POLLING, TOTAL]
+
+# percentiles included in exported metrics
+_exported_percentiles = [50, 95, 99]
+
+
+class Histogram(object):
+    """Log-linear histogram of latencies, in the style of HdrHistogram.
+
+    Values are kept in microseconds. Each power of two is split into
+    2 ** (sub_bucket_bits - 1) equally sized buckets, so any recorded value
+    is reported within a relative error of 2 ** (1 - sub_bucket_bits),
+    about 0.8% by default, whatever its magnitude. Only buckets that were
+    hit take up memory. Not thread-safe, Metrics serializes access.
+    """
+
+    def __init__(self, sub_bucket_bits=8):
+        """:type sub_bucket_bits: int"""
+        self.sub_bucket_bits = sub_bucket_bits
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self._counts = {}
+
+    def record(self, seconds):
+        """:type seconds: float"""
+        value = max(0, int(seconds * 1000000))
+        shift = max(0, value.bit_length() - self.sub_bucket_bits)
+        index = (shift, value >> shift)
+        self._counts[index] = self._counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, p):
+        """Value below which p percent of the recorded values fall, in seconds.
+
+        :type p: float
+        :rtype: float|None
+        """
+        if self.count == 0:
+            return None
+        rank = max(1, int(round(self.count * p / 100.0)))
+        seen = 0
+        for shift, sub_bucket in sorted(self._counts):
+            seen += self._counts[(shift, sub_bucket)]
+            if seen >= rank:
+                highest = ((sub_bucket + 1) << shift) - 1
+                return min(highest, self.max) / 1000000.0
+        return self.max / 1000000.0
+
+    def to_dict(self):
+        """:rtype: dict"""
+        result = dict(count=self.count)
+        if self.count > 0:
+            result['mean'] = self.total / 1000000.0 / self.count
+            result['max'] = self.max / 1000000.0
+            for p in _exported_percentiles:
+                result['p%d' % p] = self.percentile(p)
+        return result
+
+
+class CommandMetrics(object):
+    def __init__(self):
+        self.calls = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.errors = {}
+        self.histograms = dict([(phase, Histogram()) for phase in PHASES])
+
+    def to_dict(self):
+        """:rtype: dict"""
+        result = dict(calls=self.calls, request_bytes=self.request_bytes,
+                      response_bytes=self.response_bytes, errors=dict(self.errors))
+        for phase, histogram in self.histograms.iteritems():
+            result[phase] = histogram.to_dict()
+        return result
+
+
+class Metrics(object):
+    """Metrics of all commands sent through one or more connections.
+
+    Every call records its time waiting for the throttle (queue), on the
+    wire (network), waiting for its async job (polling), and end to end
+    (total).
+    """
+
+    def __init__(self):
+        self._commands = {}
+        self._lock = threading.Lock()
+
+    def __command(self, command):
+        metrics = self._commands.get(command)
+        if metrics is None:
+            metrics = self._commands.setdefault(command, CommandMetrics())
+        return metrics
+
+    def record(self, command, phase, seconds):
+        """
+        :type command: str
+        :type phase: str
+        :type seconds: float
+        """
+        with self._lock:
+            metrics = self.__command(command)
+            metrics.histograms[phase].record(seconds)
+            if phase == TOTAL:
+                metrics.calls += 1
+
+    def record_bytes(self, command, request_bytes=0, response_bytes=0):
+        with self._lock:
+            metrics = self.__command(command)
+            metrics.request_bytes += request_bytes
+            metrics.response_bytes += response_bytes
+
+    def record_error(self, command, error_class):
+        """
+        :type command: str
+        :type error_class: str
+        """
+        with self._lock:
+            errors = self.__command(command).errors
+            errors[error_class] = errors.get(error_class, 0) + 1
+
+    def percentile(self, command, p, phase=TOTAL):
+        """:rtype: float|None"""
+        with self._lock:
+            metrics = self._commands.get(command)
+            if metrics is None:
+                return None
+            return metrics.histograms[phase].percentile(p)
+
+    def commands(self):
+        """:rtype: list[str]"""
+        with self._lock:
+            return sorted(self._commands)
+
+    def to_dict(self):
+        """:rtype: dict"""
+        with self._lock:
+            return dict([(command, metrics.to_dict()) for command, metrics in self._commands.iteritems()])
+
+    def to_json(self):
+        """:rtype: str"""
+        return json.dumps(self.to_dict(), sort_keys=True, indent=2)
+
+    def dump(self, path):
+        """:type path: str"""
+        try:
+            f = open(path, 'w')
+            try:
+                f.write(self.to_json())
+            finally:
+                f.close()
+        except IOError, e:
+            logger.warn("Could not write metrics to %s: %s" % (path, e))
+
+
+_default_metrics = None
+_default_metrics_lock = threading.Lock()
+
+
+def default_metrics():
+    """Process-wide metrics, written to CS_METRICS_FILE at exit if that is set.
+
+    :rtype: Metrics
+    """
+    global _default_metrics
+    with _default_metrics_lock:
+        if _default_metrics is None:
+            _default_metrics = Metrics()
+            path = os.environ.get('CS_METRICS_FILE')
+            if path:
+                atexit.register(_default_metrics.dump, path)
+        return _default_metrics
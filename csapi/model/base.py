@@ -15,15 +15,47 @@
 # specific language governing permissions and limitations
 # under the License.
 
+from copy import copy
 from collections import MutableMapping
 
 
+def _snapshot(value):
+    # a copy, so that a list or dict that is changed in place still shows up as changed
+    if isinstance(value, (list, dict)):
+        return copy(value)
+    return value
+
+
 class Struct(MutableMapping):
-    """Dictionary-like object that also supports property syntax."""
+    """Dictionary-like object that also supports property syntax.
+
+    A Struct remembers its fields as they were when it was last marked clean,
+    which the object APIs do when they load it, so that changes() can tell
+    which fields have been changed since. That state is kept in a slot, so it
+    is not one of the fields. copy.copy() does carry it over, so a copy
+    reports the same changes() as the original.
+    """
+    __slots__ = ('_clean',)
 
     def __init__(self, **kwargs):
         self.__dict__.update(kwargs)
 
+    def mark_clean(self):
+        """Makes the current field values the ones changes() compares with."""
+        self._clean = dict([(k, _snapshot(v)) for k, v in self.__dict__.iteritems()])
+
+    def changes(self):
+        """The fields that are new or changed since mark_clean(), or all fields if it was never called.
+
+        :rtype: dict
+        """
+        clean = getattr(self, '_clean', None)
+        if clean is None:
+            return dict(self.__dict__)
+        missing = object()
+        return dict([(k, v) for k, v in self.__dict__.iteritems()
+                     if clean.get(k, missing) != v])
+
     def __iter__(self):
         return self.__dict__.__iter__()
 
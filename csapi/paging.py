@@ -0,0 +1,53 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Walking through list results page by page."""
+
+from csapi.futures import Executor
+
+DEFAULT_PAGE_SIZE = 500
+
+# separate from the default executor, so that listing from a task on that
+# executor cannot end up waiting for a prefetch queued behind itself
+_prefetch_executor = Executor(max_workers=8, name='csapi-prefetch')
+
+
+def iter_pages(list_page, pagesize=DEFAULT_PAGE_SIZE, executor=None):
+    """Yields the results of consecutive pages, fetching the next page while the current one is consumed.
+
+    Stops after the first page that is not full. At most two pages are held
+    in memory at any time.
+
+    :param list_page: called with a page number counting from 1, returns that
+        page's results or None
+    :type list_page: (int) -> list
+    :type pagesize: int
+    :type executor: csapi.futures.Executor
+    :rtype: collections.Iterator
+    """
+    if executor is None:
+        executor = _prefetch_executor
+    page = 1
+    current = executor.submit(list_page, page)
+    while current is not None:
+        results = current.result() or []
+        current = None
+        if len(results) >= pagesize:
+            page += 1
+            current = executor.submit(list_page, page)
+        for result in results:
+            yield result
@@ -0,0 +1,136 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Command and response classes materialized from a table of command specs.
+
+`python codegenerator.py --registry` writes the table to
+csapi/command_table.py as COMMANDS, a dict from command name to a tuple of
+
+    (is_async, ((param, data_type, required, is_list), ...),
+               ((field, data_type, ((subfield, ...), ...)), ...))
+
+Classes are only built for the commands that are used, and behave like the
+ones in marvin.cloudstackAPI.
+"""
+
+import threading
+from collections import namedtuple
+
+CommandSpec = namedtuple('CommandSpec', ['name', 'is_async', 'params', 'response'])
+Param = namedtuple('Param', ['name', 'data_type', 'required', 'is_list'])
+Field = namedtuple('Field', ['name', 'data_type', 'fields'])
+
+
+def _command_init(is_async, params):
+    required = [p.name for p in params if p.required]
+
+    def __init__(self):
+        self.isAsync = is_async
+        for param in params:
+            if param.is_list:
+                setattr(self, param.name, [])
+            else:
+                setattr(self, param.name, None)
+        self.required = list(required)
+    return __init__
+
+
+def _response_init(fields):
+    def __init__(self):
+        for field in fields:
+            if field.fields:
+                setattr(self, field.name, [])
+            else:
+                setattr(self, field.name, None)
+    return __init__
+
+
+class CommandRegistry(object):
+    """Looks up command specs and builds their classes on first use."""
+
+    def __init__(self, table):
+        """:type table: dict"""
+        self._table = table
+        self._classes = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, name):
+        return name in self._table
+
+    def __len__(self):
+        return len(self._table)
+
+    def names(self):
+        """:rtype: list[str]"""
+        return sorted(self._table)
+
+    def spec(self, name):
+        """
+        :type name: str
+        :rtype: CommandSpec
+        """
+        is_async, params, response = self._table[name]
+        return CommandSpec(name, is_async, [Param(*p) for p in params], self.__fields(response))
+
+    def __fields(self, fields):
+        return [Field(name, data_type, self.__fields(sub_fields)) for name, data_type, sub_fields in fields]
+
+    def command_class(self, name):
+        """:rtype: type"""
+        return self.__classes(name)[0]
+
+    def response_class(self, name):
+        """:rtype: type"""
+        return self.__classes(name)[1]
+
+    def __classes(self, name):
+        classes = self._classes.get(name)
+        if classes is not None:
+            return classes
+        spec = self.spec(name)
+        command_type_info = dict([(p.name, p.data_type) for p in spec.params])
+        response_type_info = dict([(f.name, f.data_type) for f in spec.response if not f.fields])
+        command = type(name + 'Cmd', (object,), dict(
+            typeInfo=command_type_info, __init__=_command_init(str(spec.is_async).lower(), spec.params)))
+        response = type(name + 'Response', (object,), dict(
+            typeInfo=response_type_info, __init__=_response_init(spec.response)))
+        with self._lock:
+            return self._classes.setdefault(name, (command, response))
+
+
+_default_registry = None
+_default_registry_loaded = False
+_default_registry_lock = threading.Lock()
+
+
+def default_registry():
+    """Registry of the generated csapi.command_table, or None if it was not generated.
+
+    :rtype: CommandRegistry|None
+    """
+    global _default_registry, _default_registry_loaded
+    if _default_registry_loaded:
+        return _default_registry
+    with _default_registry_lock:
+        if not _default_registry_loaded:
+            try:
+                from csapi.command_table import COMMANDS
+                _default_registry = CommandRegistry(COMMANDS)
+            except ImportError:
+                _default_registry = None
+            _default_registry_loaded = True
+        return _default_registry
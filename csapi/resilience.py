@@ -0,0 +1,171 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Retries, circuit breaking and latency tracking for the transport."""
+
+import time
+import random
+import threading
+import logging
+from collections import deque
+
+from marvin.cloudstackException import CloudstackAPIException
+
+logger = logging.getLogger("csapi.resilience")
+
+# commands starting with these verbs do not change anything and are safe to repeat
+_idempotent_verbs = ['list', 'get', 'query']
+
+# statuses that mean the server is in trouble, cloudstack answers plain api errors with 530-534
+GATEWAY_ERRORS = (502, 503, 504)
+
+
+class CircuitOpenException(CloudstackAPIException):
+    pass
+
+
+def is_idempotent(command):
+    """:type command: str"""
+    for verb in _idempotent_verbs:
+        if command.startswith(verb):
+            return True
+    return False
+
+
+class RetryPolicy(object):
+    """Exponential backoff with full jitter for idempotent commands."""
+
+    def __init__(self, attempts=3, base_delay=0.1, max_delay=5.0, retry_status_codes=(429, 502, 503, 504)):
+        """
+        :type attempts: int
+        :type base_delay: float
+        :type max_delay: float
+        """
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_status_codes = retry_status_codes
+
+    def attempts_for(self, command):
+        """:rtype: int"""
+        if is_idempotent(command):
+            return self.attempts
+        return 1
+
+    def delay(self, attempt):
+        """Seconds to sleep before retry number attempt (counting from 0).
+
+        :rtype: float
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker(object):
+    """Stops sending requests to an endpoint that keeps failing.
+
+    After failure_threshold consecutive failures the circuit opens and
+    requests fail immediately. After reset_timeout seconds a single trial
+    request is let through, and its outcome closes or re-opens the circuit.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        """
+        :type name: str
+        :type failure_threshold: int
+        :type reset_timeout: float
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Raises CircuitOpenException unless a request may be sent."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN and time.time() - self._opened >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return
+        raise CircuitOpenException(
+            self.name, "circuit open after %d consecutive failures" % self._failures)
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self.state = self.CLOSED
+
+    def record_inconclusive(self):
+        """Records a request that says nothing about the endpoint, such as one that raised an unrelated error.
+
+        If it was the trial request of a half-open circuit, the next request is
+        let through as a new trial.
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self._opened = time.time() - self.reset_timeout
+
+    def record(self, success):
+        """
+        :param success: True or False, or None when the outcome is inconclusive
+        :type success: bool|None
+        """
+        if success is None:
+            self.record_inconclusive()
+        elif success:
+            self.record_success()
+        else:
+            self.record_failure()
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warn("Opening circuit for %s after %d failures" % (self.name, self._failures))
+                self.state = self.OPEN
+                self._opened = time.time()
+
+
+class LatencyTracker(object):
+    """Percentiles over a sliding window of recent latencies."""
+
+    def __init__(self, window=200, min_samples=20):
+        """
+        :type window: int
+        :type min_samples: int
+        """
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+
+    def record(self, latency):
+        self._samples.append(latency)
+
+    def percentile(self, p):
+        """:rtype: float|None"""
+        samples = sorted(self._samples)
+        if len(samples) < self.min_samples:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * p / 100.0))
+        return samples[index]
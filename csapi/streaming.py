@@ -0,0 +1,124 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Incremental parsing of XML list responses."""
+
+from xml.etree import ElementTree as ET
+
+from csapi.model import Struct
+
+_int_types = ['integer', 'int', 'long', 'short']
+_bool_types = ['boolean']
+
+
+class ResultConverter(object):
+    """Turns result elements into Structs typed like marvin's json results.
+
+    XML has no types, so the typeInfo of the marvin response class decides
+    which fields become ints and bools, and fields that the response class
+    initializes to a list always become lists, even with a single element.
+    """
+
+    def __init__(self, response=None):
+        """:type response: object"""
+        self.int_fields = set()
+        self.bool_fields = set()
+        self.list_fields = set()
+        if response is None:
+            return
+        for name, data_type in getattr(response, 'typeInfo', {}).iteritems():
+            if data_type in _int_types:
+                self.int_fields.add(name)
+            elif data_type in _bool_types:
+                self.bool_fields.add(name)
+        for name, value in response.__dict__.iteritems():
+            if isinstance(value, list):
+                self.list_fields.add(name)
+
+    def convert(self, element):
+        """:rtype: Struct"""
+        result = Struct()
+        for child in element:
+            name = child.tag
+            value = self.value(name, child)
+            if name in self.list_fields:
+                result.setdefault(name, []).append(value)
+            elif name in result:
+                previous = result[name]
+                if not isinstance(previous, list):
+                    previous = [previous]
+                    result[name] = previous
+                previous.append(value)
+            else:
+                result[name] = value
+        return result
+
+    def value(self, name, element):
+        if len(element) > 0:
+            return ResultConverter().convert(element)
+        text = element.text
+        if text is None:
+            return None
+        if name in self.int_fields:
+            try:
+                return int(text)
+            except ValueError:
+                return text
+        if name in self.bool_fields:
+            return text == 'true'
+        return text
+
+
+def iter_results(stream, response=None):
+    """Yields every result in an XML list response as soon as it is parsed.
+
+    Elements are discarded once converted, so memory use does not grow with
+    the size of the response.
+
+    :type stream: file
+    :type response: object
+    :rtype: collections.Iterator[Struct]
+    """
+    converter = ResultConverter(response)
+    depth = 0
+    root = None
+    for event, element in ET.iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            if root is None:
+                root = element
+            continue
+        depth -= 1
+        if depth == 1:
+            if element.tag != 'count':
+                yield converter.convert(element)
+            root.clear()
+
+
+def error_text(body):
+    """Extracts the errortext of an XML error response, or returns the body.
+
+    :type body: str
+    :rtype: str
+    """
+    try:
+        text = ET.fromstring(body).findtext('.//errortext')
+    except SyntaxError:
+        text = None
+    if text is None:
+        return body
+    return text
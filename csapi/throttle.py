@@ -0,0 +1,177 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Client-side rate limiting and adaptive concurrency."""
+
+import time
+import threading
+import logging
+
+logger = logging.getLogger("csapi.throttle")
+
+# HTTP status codes that mean the server wants us to slow down
+OVERLOAD_STATUS_CODES = [429, 503]
+
+
+class TokenBucket(object):
+    """Allows rate requests per second, with bursts of up to capacity."""
+
+    def __init__(self, rate, capacity, tokens=None):
+        """
+        :type rate: float
+        :type capacity: float
+        :type tokens: float
+        """
+        self._lock = threading.Lock()
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        if tokens is None:
+            tokens = capacity
+        self._tokens = min(float(tokens), self.capacity)
+        self._updated = time.time()
+
+    def __refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Takes a token, sleeping until one is available.
+
+        :returns: seconds spent waiting
+        :rtype: float
+        """
+        start = time.time()
+        while True:
+            with self._lock:
+                now = time.time()
+                self.__refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return now - start
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class AIMDController(object):
+    """Concurrency limit with additive increase and multiplicative decrease.
+
+    Every successful call grows the limit by increase / limit, so roughly by
+    increase per round of calls. A call that the server rejected as overloaded,
+    or that took more than latency_factor times the usual latency, shrinks the
+    limit by decrease, at most once per usual latency so that a burst of
+    failures from a single overload counts once.
+    """
+
+    def __init__(self, initial=8, minimum=1, maximum=64, increase=1.0, decrease=0.5,
+                 latency_factor=2.0, smoothing=0.1):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.smoothing = smoothing
+        self.latency = None
+        self._in_flight = 0
+        self._last_decrease = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Waits for a free slot.
+
+        :returns: seconds spent waiting
+        :rtype: float
+        """
+        start = time.time()
+        with self._condition:
+            while self._in_flight >= int(self.limit):
+                self._condition.wait()
+            self._in_flight += 1
+        return time.time() - start
+
+    def release(self, latency, overloaded=False):
+        """
+        :type latency: float
+        :type overloaded: bool
+        """
+        with self._condition:
+            self._in_flight -= 1
+            now = time.time()
+            slow = self.latency is not None and latency > self.latency * self.latency_factor
+            if overloaded or slow:
+                if now - self._last_decrease > (self.latency or 0):
+                    self.limit = max(self.minimum, self.limit * self.decrease)
+                    self._last_decrease = now
+                    logger.debug("Concurrency limit decreased to %d" % self.limit)
+            else:
+                self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+            if not overloaded:
+                if self.latency is None:
+                    self.latency = latency
+                else:
+                    self.latency += self.smoothing * (latency - self.latency)
+            self._condition.notify_all()
+
+
+class Throttle(object):
+    """Pairs an optional token bucket with an adaptive concurrency limit."""
+
+    def __init__(self, bucket=None, controller=None):
+        """
+        :type bucket: TokenBucket
+        :type controller: AIMDController
+        """
+        self.bucket = bucket
+        if controller is None:
+            controller = AIMDController()
+        self.controller = controller
+
+    def acquire(self):
+        """:returns: seconds spent waiting"""
+        waited = self.controller.acquire()
+        if self.bucket is not None:
+            waited += self.bucket.acquire()
+        return waited
+
+    def release(self, latency, status_code=None, unreachable=False):
+        """
+        :type latency: float
+        :param status_code: of the response, None if there was none
+        :param unreachable: whether the request failed to connect or timed out,
+            which counts as overload rather than success
+        :type unreachable: bool
+        """
+        self.controller.release(latency, overloaded=unreachable or status_code in OVERLOAD_STATUS_CODES)
+
+    @staticmethod
+    def bucket_from_api_limit(api_limit, interval=1.0):
+        """Creates a token bucket matching a getApiLimit response.
+
+        getApiLimit reports how many calls were issued and how many remain in
+        the current throttling interval, the length of which is server
+        configuration (api.throttling.interval) that has to be passed in.
+
+        :type interval: float
+        :rtype: TokenBucket
+        """
+        limit = getattr(api_limit, 'apilimit', api_limit)
+        issued = int(getattr(limit, 'apiIssued', 0) or 0)
+        allowed = int(getattr(limit, 'apiAllowed', 0) or 0)
+        capacity = issued + allowed
+        if capacity <= 0:
+            return None
+        return TokenBucket(rate=capacity / interval, capacity=capacity, tokens=allowed)
@@ -0,0 +1,159 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Structured request tracing that stays off the request path."""
+
+import os
+import gzip
+import json
+import time
+import random
+import atexit
+import threading
+import logging
+from collections import deque
+
+logger = logging.getLogger("csapi.trace")
+
+# parameters that are never written to a trace
+_redacted_params = ['password', 'signature', 'apikey', 'secretkey', 'sessionkey']
+
+
+def redact(params):
+    """:type params: dict"""
+    result = {}
+    for key, value in params.iteritems():
+        if key.lower() in _redacted_params:
+            value = '***'
+        result[key] = value
+    return result
+
+
+class TraceSink(object):
+    """Buffers trace events in memory and writes them from a background thread.
+
+    Events go into a bounded ring buffer, so a writer that cannot keep up
+    drops the oldest events instead of slowing down requests. The writer
+    appends them to a gzip-compressed file with one JSON object per line.
+    """
+
+    def __init__(self, path, capacity=10000, sample_rate=1.0, commands=None, flush_interval=1.0):
+        """
+        :type path: str
+        :type capacity: int
+        :type sample_rate: float
+        :type commands: list[str]
+        :type flush_interval: float
+        """
+        self.path = path
+        self.sample_rate = sample_rate
+        self.commands = None
+        if commands:
+            self.commands = frozenset(commands)
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._buffer = deque(maxlen=capacity)
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self.__run, name="csapi-trace")
+        self._thread.daemon = True
+        self._thread.start()
+        atexit.register(self.close)
+
+    def wants(self, command):
+        """Decides whether an event for command should be recorded at all.
+
+        Cheap enough to call before building the event.
+
+        :type command: str
+        :rtype: bool
+        """
+        if self.commands is not None and command not in self.commands:
+            return False
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def record(self, event):
+        """:type event: dict"""
+        event.setdefault('ts', time.time())
+        with self._condition:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append(event)
+
+    def close(self):
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+
+    def __drain(self):
+        with self._condition:
+            events = list(self._buffer)
+            self._buffer.clear()
+        return events
+
+    def __run(self):
+        while True:
+            with self._condition:
+                if not self._closed:
+                    self._condition.wait(self.flush_interval)
+                closed = self._closed
+            events = self.__drain()
+            if events:
+                self.__write(events)
+            if closed:
+                return
+
+    def __write(self, events):
+        try:
+            f = gzip.open(self.path, 'ab')
+            try:
+                for event in events:
+                    f.write(json.dumps(event, default=repr))
+                    f.write('\n')
+            finally:
+                f.close()
+        except IOError, e:
+            logger.warn("Could not write %d trace events to %s: %s" % (len(events), self.path, e))
+
+
+_default_sink = None
+_default_sink_lock = threading.Lock()
+
+
+def default_sink():
+    """Process-wide trace sink configured from the environment.
+
+    CS_TRACE_FILE (default cstest-trace.jsonl.gz), CS_TRACE_BUFFER (default
+    10000 events), CS_TRACE_SAMPLE_RATE (default 1.0) and CS_TRACE_COMMANDS
+    (comma-separated, default all commands).
+
+    :rtype: TraceSink
+    """
+    global _default_sink
+    with _default_sink_lock:
+        if _default_sink is None:
+            env = os.environ
+            commands = [c.strip() for c in env.get('CS_TRACE_COMMANDS', '').split(',') if c.strip()]
+            _default_sink = TraceSink(
+                env.get('CS_TRACE_FILE', 'cstest-trace.jsonl.gz'),
+                capacity=int(env.get('CS_TRACE_BUFFER', '10000')),
+                sample_rate=float(env.get('CS_TRACE_SAMPLE_RATE', '1.0')),
+                commands=commands)
+        return _default_sink
@@ -0,0 +1,98 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Pooled keep-alive HTTP transport."""
+
+import threading
+import logging
+import weakref
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger("csapi.transport")
+
+
+class PooledTransport(object):
+    """Hands out one requests.Session per thread, all sharing one connection pool.
+
+    requests.Session is not safe to share between threads, but a session per
+    call throws away the connection after every request. The sessions of all
+    threads share a single HTTPAdapter, whose urllib3 pools are thread safe,
+    so at most pool_size connections per host are kept alive in total. Threads
+    that find them all in use open short-lived extra connections.
+    """
+
+    def __init__(self, pool_size=10, keep_alive=True):
+        """
+        :type pool_size: int
+        :type keep_alive: bool
+        """
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self._local = threading.local()
+        self._adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        # the session of a thread that has exited goes away with it
+        self._sessions = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def session(self):
+        """:rtype: requests.Session"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._new_session()
+            self._local.session = session
+            with self._lock:
+                self._sessions.add(session)
+        return session
+
+    def _new_session(self):
+        session = requests.Session()
+        session.mount('http://', self._adapter)
+        session.mount('https://', self._adapter)
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+        return session
+
+    def request(self, method, url, **kwargs):
+        return self.session().request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def prewarm(self, url, **kwargs):
+        """Opens a connection to url ahead of the first real request.
+
+        Any HTTP response is fine, the point is to get the TCP (and TLS)
+        handshake out of the way. Failures are logged and otherwise ignored.
+        """
+        try:
+            self.request('HEAD', url, **kwargs)
+        except requests.RequestException, e:
+            logger.debug("Pre-warming connection to %s failed: %s" % (url, e))
+
+    def close(self):
+        """Closes the sessions of all threads and the pooled connections."""
+        with self._lock:
+            sessions = list(self._sessions)
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+        self._adapter.close()
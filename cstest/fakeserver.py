@@ -0,0 +1,753 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""In-process stand-in for a cloudstack management server.
+
+Speaks the client/api protocol for the commands wrapped by csapi: login and
+api key discovery, signature checking, and the account, domain, user and
+zone commands, plus async job handling. It keeps everything in memory and
+does not model permissions, every authenticated user acts as root admin.
+
+Run the smoke tests against it with `CS_FAKE_SERVER=1 ./test.sh`, or start it
+standalone for load tooling with `python cstest/fakeserver.py --port 8080`.
+"""
+
+import re
+import time
+import json
+import uuid
+import hmac
+import base64
+import hashlib
+import urllib
+import urlparse
+import threading
+import logging
+from optparse import OptionParser
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
+from xml.sax.saxutils import escape
+
+logger = logging.getLogger("cstest.fakeserver")
+
+VERSION = '4.5.0'
+API_PATH = '/client/api'
+
+JOB_PENDING = 0
+JOB_SUCCEEDED = 1
+JOB_FAILED = 2
+
+# longest value accepted for string parameters, like the real server's database columns
+_max_param_length = 255
+_network_domain_re = re.compile(r'^[a-zA-Z0-9]([a-zA-Z0-9-]*[a-zA-Z0-9])?(\.[a-zA-Z0-9]([a-zA-Z0-9-]*[a-zA-Z0-9])?)*$')
+
+
+class ApiError(Exception):
+    def __init__(self, errorcode, errortext):
+        super(ApiError, self).__init__(errortext)
+        self.errorcode = errorcode
+        self.errortext = errortext
+
+
+def param_error(text):
+    return ApiError(431, text)
+
+
+def _new_id():
+    return str(uuid.uuid4())
+
+
+def _now():
+    return time.strftime('%Y-%m-%dT%H:%M:%S+0000', time.gmtime())
+
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).lower() == 'true'
+
+
+def expected_signature(params, secret_key):
+    """Signature the client should have sent along with params."""
+    pairs = []
+    for name, value in params.iteritems():
+        if name == 'signature':
+            continue
+        encoded = urllib.quote_plus(value).lower().replace('+', '%20')
+        pairs.append((name.lower(), encoded))
+    pairs.sort()
+    hash_str = '&'.join(['%s=%s' % pair for pair in pairs])
+    return base64.b64encode(hmac.new(secret_key, hash_str, hashlib.sha1).digest())
+
+
+class Job(object):
+    def __init__(self, command, userid, account):
+        self.jobid = _new_id()
+        self.command = command
+        self.userid = userid
+        self.accountid = account['id']
+        self.created = _now()
+        self.status = JOB_PENDING
+        self.result = None
+        self.resultcode = 0
+
+    def view(self):
+        view = dict(jobid=self.jobid, cmd=self.command, created=self.created, userid=self.userid,
+                    accountid=self.accountid, jobstatus=self.status, jobresultcode=self.resultcode,
+                    jobprocstatus=0)
+        if self.status != JOB_PENDING:
+            view['jobresulttype'] = 'object'
+            view['jobresult'] = self.result
+        return view
+
+
+class CloudStackState(object):
+    """All the in-memory data of the fake server and the commands acting on it."""
+
+    def __init__(self, admin_user='admin', admin_password='password', job_delay=0.2, api_limit=100000):
+        self.lock = threading.RLock()
+        self.job_delay = job_delay
+        self.api_limit = api_limit
+        self.domains = {}
+        self.accounts = {}
+        self.users = {}
+        self.zones = {}
+        self.jobs = {}
+        self.sessions = {}
+        self.api_issued = 0
+        root = dict(id=_new_id(), name='ROOT', path='ROOT', level=0, haschild=False,
+                    parentdomainid=None, parentdomainname=None, networkdomain=None, state='Active')
+        self.domains[root['id']] = root
+        self.root_domain = root
+        admin_account = self.__add_account(dict(
+            username=admin_user, password=admin_password, firstname='admin', lastname='cloud',
+            email='admin@localhost', accounttype='1', domainid=root['id']))
+        self.admin_user = self.users[admin_account['user'][0]['id']]
+
+    # authentication
+
+    def login(self, params):
+        username = params.get('username')
+        domain_path = params.get('domain') or '/'
+        with self.lock:
+            for user in self.users.itervalues():
+                domain = self.domains[user['domainid']]
+                path = '/' + domain['path'][len('ROOT'):].strip('/')
+                if user['username'] == username and user['password'] == params.get('password') \
+                        and path.rstrip('/') == domain_path.rstrip('/'):
+                    break
+            else:
+                raise ApiError(401, "failed to log in: unable to verify user credentials")
+            session_id = uuid.uuid4().hex.upper()
+            session_key = base64.b64encode(uuid.uuid4().bytes)
+            self.sessions[session_id] = (session_key, user['id'])
+        account = self.accounts[user['accountid']]
+        response = dict(timeout=1800, username=user['username'], userid=user['id'],
+                        firstname=user['firstname'], lastname=user['lastname'],
+                        domainid=user['domainid'], account=account['name'],
+                        type=account['accounttype'], registered='false', sessionkey=session_key)
+        return session_id, response
+
+    def authenticate(self, params, session_id):
+        """Returns the calling user, checking either the session or the signature."""
+        with self.lock:
+            if 'sessionkey' in params:
+                session = self.sessions.get(session_id)
+                if session is not None and session[0] == params['sessionkey']:
+                    return self.users[session[1]]
+            elif 'apiKey' in params and 'signature' in params:
+                for user in self.users.itervalues():
+                    if user.get('apikey') == params['apiKey']:
+                        expected = expected_signature(params, user['secretkey'])
+                        if expected == params['signature']:
+                            return user
+                        break
+        raise ApiError(401, "unable to verify user credentials and/or request signature")
+
+    # commands
+
+    def execute(self, command, params, caller):
+        handler = getattr(self, 'cmd_' + command, None)
+        if handler is None:
+            raise ApiError(432, "The given command %s does not exist or it is not available for user" % command)
+        for name, value in params.iteritems():
+            if len(value) > _max_param_length and name not in ['signature', 'sessionkey']:
+                raise param_error("Value of the parameter %s exceeds the maximum allowed length of %d" % (
+                    name, _max_param_length))
+        with self.lock:
+            self.api_issued += 1
+            return handler(params, caller)
+
+    def __submit_job(self, command, caller, fn):
+        job = Job(command, caller['id'], self.accounts[caller['accountid']])
+        self.jobs[job.jobid] = job
+
+        def run():
+            with self.lock:
+                try:
+                    job.result = fn()
+                    job.status = JOB_SUCCEEDED
+                except ApiError, e:
+                    job.result = dict(errorcode=e.errorcode, errortext=e.errortext)
+                    job.resultcode = 530
+                    job.status = JOB_FAILED
+        timer = threading.Timer(self.job_delay, run)
+        timer.daemon = True
+        timer.start()
+        return dict(jobid=job.jobid)
+
+    def cmd_queryAsyncJobResult(self, params, caller):
+        job = self.jobs.get(self.__required(params, 'jobid'))
+        if job is None:
+            raise param_error("Unable to find job by id %s" % params['jobid'])
+        return job.view()
+
+    def cmd_listAsyncJobs(self, params, caller):
+        jobs = [job.view() for job in self.jobs.itervalues() if job.accountid == caller['accountid']]
+        return self.__page('asyncjobs', jobs, params)
+
+    def cmd_getApiLimit(self, params, caller):
+        account = self.accounts[caller['accountid']]
+        return dict(apilimit=dict(account=account['name'], accountid=account['id'],
+                                  apiIssued=self.api_issued, apiAllowed=self.api_limit, expireAfter=1000))
+
+    def cmd_listUsers(self, params, caller):
+        users = self.__scoped(self.users.values(), params, caller)
+        users = self.__filter(users, params, 'id', 'username', 'account', 'accounttype', 'state')
+        views = [self.__user_view(u, with_keys=(u['id'] == params.get('id'))) for u in users]
+        return self.__page('user', views, params, 'username')
+
+    def cmd_registerUserKeys(self, params, caller):
+        user = self.__get(self.users, params, 'id', 'user')
+        user['apikey'] = base64.urlsafe_b64encode(uuid.uuid4().bytes + uuid.uuid4().bytes).rstrip('=')
+        user['secretkey'] = base64.urlsafe_b64encode(uuid.uuid4().bytes + uuid.uuid4().bytes).rstrip('=')
+        return dict(userkeys=dict(apikey=user['apikey'], secretkey=user['secretkey']))
+
+    def cmd_createUser(self, params, caller):
+        for name in ['account', 'email', 'firstname', 'lastname', 'password', 'username']:
+            self.__required(params, name)
+        domain = self.__domain(params.get('domainid'), caller)
+        account = self.__account_by_name(params['account'], domain)
+        if account is None:
+            raise param_error("Unable to find account %s in domain id=%s" % (params['account'], domain['id']))
+        user = self.__add_user(params, account)
+        return dict(user=self.__user_view(user))
+
+    def cmd_updateUser(self, params, caller):
+        user = self.__get(self.users, params, 'id', 'user')
+        username = params.get('username')
+        if username is not None and username != user['username']:
+            self.__check_unique_username(username, self.domains[user['domainid']])
+            user['username'] = username
+        for name in ['email', 'firstname', 'lastname', 'password', 'timezone']:
+            if name in params:
+                user[name] = params[name]
+        return dict(user=self.__user_view(user))
+
+    def cmd_deleteUser(self, params, caller):
+        user = self.__get(self.users, params, 'id', 'user')
+        if user['id'] == caller['id']:
+            raise param_error("Unable to delete the user making the request")
+        self.__remove_user(user)
+        return dict(success='true')
+
+    def cmd_createAccount(self, params, caller):
+        for name in ['accounttype', 'email', 'firstname', 'lastname', 'password', 'username']:
+            self.__required(params, name)
+        account = self.__add_account(params, caller)
+        return dict(account=self.__account_view(account))
+
+    def cmd_updateAccount(self, params, caller):
+        account = self.__account_from(params, caller)
+        new_name = params.get('newname')
+        if new_name is not None and new_name != account['name']:
+            if self.__account_by_name(new_name, self.domains[account['domainid']]) is not None:
+                raise param_error("The account with the proposed name %s already exists in the domain" % new_name)
+            account['name'] = new_name
+            for user in account['user']:
+                self.users[user['id']]['account'] = new_name
+        if 'networkdomain' in params:
+            account['networkdomain'] = self.__network_domain(params['networkdomain'])
+        return dict(account=self.__account_view(account))
+
+    def cmd_deleteAccount(self, params, caller):
+        account = self.__get(self.accounts, params, 'id', 'account')
+        if account['id'] == caller['accountid']:
+            raise param_error("Unable to delete the account making the request")
+
+        def delete():
+            if account['id'] not in self.accounts:
+                raise ApiError(530, "Account %s was already deleted" % account['id'])
+            for user in list(account['user']):
+                self.__remove_user(self.users[user['id']])
+            del self.accounts[account['id']]
+            return dict(success=True)
+        return self.__submit_job('deleteAccount', caller, delete)
+
+    def cmd_listAccounts(self, params, caller):
+        accounts = self.__scoped(self.accounts.values(), params, caller)
+        accounts = self.__filter(accounts, params, 'id', 'name', 'accounttype', 'state')
+        views = [self.__account_view(a) for a in accounts]
+        return self.__page('account', views, params, 'name')
+
+    def cmd_createDomain(self, params, caller):
+        name = self.__required(params, 'name')
+        parent = self.__domain(params.get('parentdomainid'), caller)
+        self.__check_unique_domain_name(name, parent)
+        domain = dict(id=params.get('domainid') or _new_id(), name=name, path=parent['path'] + '/' + name,
+                      level=parent['level'] + 1, haschild=False, parentdomainid=parent['id'],
+                      parentdomainname=parent['name'], state='Active',
+                      networkdomain=self.__network_domain(params.get('networkdomain')))
+        if domain['id'] in self.domains:
+            raise param_error("Domain with id %s already exists" % domain['id'])
+        self.domains[domain['id']] = domain
+        parent['haschild'] = True
+        return dict(domain=dict(domain))
+
+    def cmd_updateDomain(self, params, caller):
+        domain = self.__get(self.domains, params, 'id', 'domain')
+        name = params.get('name')
+        if name is not None and name != domain['name']:
+            if domain is self.root_domain:
+                raise param_error("Can't change the name of the ROOT domain")
+            self.__check_unique_domain_name(name, self.domains[domain['parentdomainid']])
+            old_path = domain['path']
+            new_path = old_path[:-len(domain['name'])] + name
+            for other in self.domains.itervalues():
+                if other['path'] == old_path or other['path'].startswith(old_path + '/'):
+                    other['path'] = new_path + other['path'][len(old_path):]
+                if other['parentdomainid'] == domain['id']:
+                    other['parentdomainname'] = name
+            domain['name'] = name
+        if 'networkdomain' in params:
+            domain['networkdomain'] = self.__network_domain(params['networkdomain'])
+        return dict(domain=dict(domain))
+
+    def cmd_deleteDomain(self, params, caller):
+        domain = self.__get(self.domains, params, 'id', 'domain')
+        if domain is self.root_domain:
+            raise param_error("Can't delete the ROOT domain")
+        cleanup = _bool(params.get('cleanup', 'false'))
+
+        def delete():
+            if domain['id'] not in self.domains:
+                raise ApiError(530, "Domain %s was already deleted" % domain['id'])
+            self.__delete_domain(domain, cleanup)
+            return dict(success=True)
+        return self.__submit_job('deleteDomain', caller, delete)
+
+    def cmd_listDomains(self, params, caller):
+        domains = self.__scoped(self.domains.values(), params, caller, domain_key='id')
+        domains = self.__filter(domains, params, 'id', 'name', 'level')
+        return self.__page('domain', [dict(d) for d in domains], params, 'name')
+
+    def cmd_listDomainChildren(self, params, caller):
+        parent = self.__domain(params.get('id'), caller)
+        recursive = _bool(params.get('isrecursive', 'false'))
+        children = [dict(d) for d in self.domains.itervalues()
+                    if d['parentdomainid'] == parent['id']
+                    or (recursive and d['path'].startswith(parent['path'] + '/'))]
+        return self.__page('domain', children, params, 'name')
+
+    def cmd_createZone(self, params, caller):
+        for name in ['dns1', 'internaldns1', 'name', 'networktype']:
+            self.__required(params, name)
+        if params['networktype'] not in ['Basic', 'Advanced']:
+            raise param_error("Invalid network type %s, should be Basic or Advanced" % params['networktype'])
+        self.__check_unique_zone_name(params['name'])
+        zone = dict(id=_new_id(), allocationstate=params.get('allocationstate', 'Disabled'),
+                    securitygroupsenabled=_bool(params.get('securitygroupenabled', 'false')),
+                    localstorageenabled=_bool(params.get('localstorageenabled', 'false')),
+                    zonetoken=uuid.uuid4().hex)
+        for name in ['name', 'dns1', 'dns2', 'internaldns1', 'internaldns2', 'ip6dns1', 'ip6dns2',
+                     'networktype', 'guestcidraddress', 'domain', 'domainid']:
+            zone[name] = params.get(name)
+        self.zones[zone['id']] = zone
+        return dict(zone=dict(zone))
+
+    def cmd_updateZone(self, params, caller):
+        zone = self.__get(self.zones, params, 'id', 'zone')
+        name = params.get('name')
+        if name is not None and name != zone['name']:
+            self.__check_unique_zone_name(name)
+        for name in ['name', 'dns1', 'dns2', 'internaldns1', 'internaldns2', 'ip6dns1', 'ip6dns2',
+                     'guestcidraddress', 'domain', 'allocationstate']:
+            if name in params:
+                zone[name] = params[name]
+        if 'localstorageenabled' in params:
+            zone['localstorageenabled'] = _bool(params['localstorageenabled'])
+        return dict(zone=dict(zone))
+
+    def cmd_deleteZone(self, params, caller):
+        zone = self.__get(self.zones, params, 'id', 'zone')
+        del self.zones[zone['id']]
+        return dict(success='true')
+
+    def cmd_listZones(self, params, caller):
+        zones = self.__filter(self.zones.values(), params, 'id', 'name', 'networktype', 'domainid')
+        return self.__page('zone', [dict(z) for z in zones], params, 'name')
+
+    # helpers
+
+    @staticmethod
+    def __required(params, name):
+        value = params.get(name)
+        if value is None or value == '':
+            raise param_error("Unable to execute API command due to missing parameter %s" % name)
+        return value
+
+    @staticmethod
+    def __get(collection, params, id_param, kind):
+        object_id = params.get(id_param)
+        if object_id is None:
+            raise param_error("Unable to execute API command due to missing parameter %s" % id_param)
+        found = collection.get(object_id)
+        if found is None:
+            raise param_error("Unable to find %s by id %s" % (kind, object_id))
+        return found
+
+    def __domain(self, domain_id, caller):
+        if domain_id is None:
+            return self.domains[caller['domainid']]
+        domain = self.domains.get(domain_id)
+        if domain is None:
+            raise param_error("Unable to find domain by id %s" % domain_id)
+        return domain
+
+    def __account_by_name(self, name, domain):
+        for account in self.accounts.itervalues():
+            if account['name'] == name and account['domainid'] == domain['id']:
+                return account
+        return None
+
+    def __account_from(self, params, caller):
+        if 'id' in params:
+            return self.__get(self.accounts, params, 'id', 'account')
+        domain = self.__domain(params.get('domainid'), caller)
+        account = self.__account_by_name(self.__required(params, 'account'), domain)
+        if account is None:
+            raise param_error("Unable to find account %s in domain id=%s" % (params['account'], domain['id']))
+        return account
+
+    def __network_domain(self, network_domain):
+        if network_domain is None or network_domain == '':
+            return None
+        if not _network_domain_re.match(network_domain):
+            raise param_error(
+                "Invalid network domain %s. Total length shouldn't exceed 190 chars. Each domain label must "
+                "be between 1 and 63 characters long, can contain ASCII letters 'a' through 'z', the digits "
+                "'0' through '9', and the hyphen ('-'); can neither start nor end with \"-\"" % network_domain)
+        return network_domain
+
+    def __check_unique_username(self, username, domain):
+        for user in self.users.itervalues():
+            if user['username'] == username and user['domainid'] == domain['id']:
+                raise param_error("The user %s already exists in domain %s" % (username, domain['path']))
+
+    def __check_unique_domain_name(self, name, parent):
+        for domain in self.domains.itervalues():
+            if domain['parentdomainid'] == parent['id'] and domain['name'].lower() == name.lower():
+                raise param_error("Domain with name %s already exists for the parent id=%s" % (name, parent['id']))
+
+    def __check_unique_zone_name(self, name):
+        for zone in self.zones.itervalues():
+            if zone['name'] == name:
+                raise param_error("A zone with name %s already exists" % name)
+
+    def __add_account(self, params, caller=None):
+        if caller is None:
+            domain = self.root_domain
+        else:
+            domain = self.__domain(params.get('domainid'), caller)
+        name = params.get('account') or params['username']
+        account_type = int(params['accounttype'])
+        if account_type not in [0, 1, 2]:
+            raise param_error("Invalid account type %s given; unable to create user" % params['accounttype'])
+        if self.__account_by_name(name, domain) is not None:
+            raise param_error("The specified account: %s already exists" % name)
+        self.__check_unique_username(params['username'], domain)
+        account = dict(id=params.get('accountid') or _new_id(), name=name, accounttype=account_type,
+                       domainid=domain['id'], domain=domain['name'], state='enabled', user=[],
+                       networkdomain=self.__network_domain(params.get('networkdomain')))
+        self.accounts[account['id']] = account
+        self.__add_user(params, account, user_id=params.get('userid'))
+        return account
+
+    def __add_user(self, params, account, user_id=None):
+        domain = self.domains[account['domainid']]
+        self.__check_unique_username(params['username'], domain)
+        user = dict(id=user_id or params.get('userid') or _new_id(), username=params['username'],
+                    password=params['password'], firstname=params['firstname'], lastname=params['lastname'],
+                    email=params['email'], timezone=params.get('timezone'), account=account['name'],
+                    accountid=account['id'], accounttype=account['accounttype'], domainid=domain['id'],
+                    domain=domain['name'], state='enabled', created=_now())
+        self.users[user['id']] = user
+        account['user'].append(dict(id=user['id']))
+        return user
+
+    def __remove_user(self, user):
+        account = self.accounts[user['accountid']]
+        account['user'] = [u for u in account['user'] if u['id'] != user['id']]
+        del self.users[user['id']]
+
+    def __delete_domain(self, domain, cleanup):
+        children = [d for d in self.domains.values() if d['parentdomainid'] == domain['id']]
+        accounts = [a for a in self.accounts.values() if a['domainid'] == domain['id']]
+        if not cleanup and (children or accounts):
+            raise ApiError(530, "Can't delete the domain yet because it still has child domains or "
+                                "active users/accounts in it")
+        for child in children:
+            self.__delete_domain(child, cleanup)
+        for account in accounts:
+            for user in list(account['user']):
+                self.__remove_user(self.users[user['id']])
+            del self.accounts[account['id']]
+        del self.domains[domain['id']]
+        parent = self.domains[domain['parentdomainid']]
+        parent['haschild'] = any(d['parentdomainid'] == parent['id'] for d in self.domains.itervalues())
+
+    def __scoped(self, objects, params, caller, domain_key='domainid'):
+        """Narrows objects down to the domains a list call asks for.
+
+        Like the real server, listall or isrecursive include subdomains of the
+        (given or caller's) domain, otherwise only that domain itself.
+        """
+        domain = self.__domain(params.get('domainid'), caller)
+        recursive = _bool(params.get('listall', 'false')) or _bool(params.get('isrecursive', 'false'))
+        if domain_key == 'id' and 'domainid' not in params and ('id' in params or 'name' in params):
+            recursive = True
+        prefix = domain['path'] + '/'
+        result = []
+        for obj in objects:
+            obj_domain = self.domains.get(obj[domain_key])
+            if obj_domain is None:
+                continue
+            if obj_domain['id'] == domain['id'] or (recursive and obj_domain['path'].startswith(prefix)):
+                result.append(obj)
+        return result
+
+    @staticmethod
+    def __filter(objects, params, *names):
+        result = objects
+        for name in names:
+            if name in params:
+                value = params[name]
+                result = [o for o in result if str(o.get(name)) == value]
+        keyword = params.get('keyword')
+        if keyword is not None:
+            result = [o for o in result if keyword in (o.get('name') or o.get('username') or '')]
+        return result
+
+    @staticmethod
+    def __page(tag, objects, params, sort_key=None):
+        if sort_key is not None:
+            objects = sorted(objects, key=lambda o: o.get(sort_key))
+        count = len(objects)
+        if 'pagesize' in params:
+            page_size = int(params['pagesize'])
+            page = int(params.get('page', '1'))
+            objects = objects[(page - 1) * page_size:page * page_size]
+        if count == 0:
+            return dict()
+        return dict([('count', count), (tag, objects)])
+
+    def __account_view(self, account):
+        view = dict(account)
+        view['user'] = [self.__user_view(self.users[u['id']]) for u in account['user']]
+        return view
+
+    @staticmethod
+    def __user_view(user, with_keys=False):
+        view = dict(user)
+        del view['password']
+        if not with_keys:
+            view.pop('apikey', None)
+            view.pop('secretkey', None)
+        return view
+
+
+def compact(value):
+    """Drops unset fields, which the real server leaves out of responses."""
+    if isinstance(value, dict):
+        return dict([(k, compact(v)) for k, v in value.iteritems() if v is not None])
+    if isinstance(value, list):
+        return [compact(v) for v in value]
+    return value
+
+
+def to_xml(tag, value):
+    if isinstance(value, dict):
+        return '<%s>%s</%s>' % (tag, ''.join([to_xml(k, v) for k, v in value.iteritems()]), tag)
+    if isinstance(value, list):
+        return ''.join([to_xml(tag, v) for v in value])
+    if isinstance(value, bool):
+        value = str(value).lower()
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    return '<%s>%s</%s>' % (tag, escape(str(value)), tag)
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'FakeCloudStack/' + VERSION
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        self.__handle()
+
+    def do_POST(self):
+        self.__handle()
+
+    def __params(self):
+        url = urlparse.urlparse(self.path)
+        params = dict(urlparse.parse_qsl(url.query, keep_blank_values=True))
+        length = int(self.headers.getheader('content-length') or 0)
+        if length > 0:
+            params.update(urlparse.parse_qsl(self.rfile.read(length), keep_blank_values=True))
+        return url.path, params
+
+    def __session_id(self):
+        cookies = self.headers.getheader('cookie') or ''
+        match = re.search(r'JSESSIONID=([^;]+)', cookies)
+        if match is None:
+            return None
+        return match.group(1)
+
+    def __handle(self):
+        path, params = self.__params()
+        command = params.get('command', '')
+        state = self.server.state
+        cookie = None
+        try:
+            if path.rstrip('/') != API_PATH:
+                raise ApiError(404, "Not found: %s" % path)
+            if command == 'login':
+                session_id, result = state.login(params)
+                cookie = 'JSESSIONID=%s; Path=/client/; HttpOnly' % session_id
+            else:
+                caller = state.authenticate(params, self.__session_id())
+                result = state.execute(command, params, caller)
+            status = 200
+        except ApiError, e:
+            status = e.errorcode
+            result = dict(uuidList=[], errorcode=e.errorcode, cserrorcode=4350, errortext=e.errortext)
+        except Exception, e:
+            logger.exception("Failed to handle %s" % command)
+            status = 530
+            result = dict(uuidList=[], errorcode=530, cserrorcode=9999, errortext=str(e))
+        self.__respond(status, command, params.get('response', 'xml'), result, cookie)
+
+    def __respond(self, status, command, response_format, result, cookie):
+        response_name = command.lower() + 'response'
+        result = compact(result)
+        if response_format == 'json':
+            body = json.dumps({response_name: result})
+            content_type = 'application/json; charset=UTF-8'
+        else:
+            body = '<?xml version="1.0" encoding="UTF-8"?>'
+            body += to_xml(response_name, result).replace(
+                '<%s>' % response_name, '<%s cloud-stack-version="%s">' % (response_name, VERSION), 1)
+            content_type = 'text/xml; charset=UTF-8'
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if cookie is not None:
+            self.send_header('Set-Cookie', cookie)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FakeManagementServer(object):
+    """Runs a CloudStackState behind an HTTP server on a background thread."""
+
+    def __init__(self, host='127.0.0.1', port=0, **kwargs):
+        """
+        :type host: str
+        :type port: int
+        """
+        self.state = CloudStackState(**kwargs)
+        self.httpd = _ThreadingHTTPServer((host, port), ApiRequestHandler)
+        self.httpd.state = self.state
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address
+        return 'http://%s:%d%s' % (host, port, API_PATH)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-management-server")
+        self._thread.daemon = True
+        self._thread.start()
+        logger.info("Fake management server listening on %s" % self.base_url)
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+_shared_server = None
+_shared_server_lock = threading.Lock()
+
+
+def shared_server():
+    """Process-wide fake server, started on first use.
+
+    :rtype: FakeManagementServer
+    """
+    global _shared_server
+    with _shared_server_lock:
+        if _shared_server is None:
+            _shared_server = FakeManagementServer().start()
+        return _shared_server
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option("--host", dest="host", default="127.0.0.1", help="The address to listen on")
+    parser.add_option("--port", dest="port", type="int", default=8080, help="The port to listen on")
+    parser.add_option("--user", dest="user", default="admin", help="The admin user name")
+    parser.add_option("--password", dest="password", default="password", help="The admin password")
+    parser.add_option("--job-delay", dest="job_delay", type="float", default=0.2,
+                      help="Seconds it takes for async jobs to complete")
+    (options, args) = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = FakeManagementServer(host=options.host, port=options.port, admin_user=options.user,
+                                  admin_password=options.password, job_delay=options.job_delay)
+    print "Serving on %s" % server.base_url
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -17,10 +17,11 @@
 
 """Basic integration tests for CIT environment."""
 
+import os
 import unittest
 import logging
 
-from csapi.apiclient import CSConnection, CloudStackAPIClient, CloudstackAPIException
+from csapi.apiclient import CloudstackAPIException, connections
 from csapi.domain import DomainAPI
 from csapi.zone import ZoneAPI
 from csapi.account import AccountAPI
@@ -63,8 +64,13 @@ class CITTestCase(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls):
-        cls.connection = CSConnection()
-        cls.api_client = CloudStackAPIClient(cls.connection)
+        if os.environ.get('CS_FAKE_SERVER', '0') == '1':
+            from cstest.fakeserver import shared_server
+            # keys of a fake server are gone once the process exits, no point caching them
+            os.environ['CS_BASE_URL'] = shared_server().base_url
+            os.environ.setdefault('CS_CREDENTIAL_CACHE', '')
+        cls.connection = connections.connection()
+        cls.api_client = connections.api_client()
         cls.domain_api = DomainAPI()
         cls.zone_api = ZoneAPI()
         cls.account_api = AccountAPI()
@@ -21,7 +21,9 @@ Basic tests of account and user management.
 
 from csapi.model import USER_ACC, DOMAIN_ACC, ADMIN_ACC
 from cstest.framework import CITTestCase, failing
-from csapi.apiclient import CloudstackAPIException
+from csapi.apiclient import CloudstackAPIException, connections
+from csapi.account import AccountAPI
+from csapi.batch import BatchExecutor
 
 class AccountTestCase(CITTestCase):
     @classmethod
@@ -61,6 +63,43 @@ class AccountTestCase(CITTestCase):
         account2.domainid = domain2.id
         self.account_api.create(account2)
 
+    def test_batch_account_creation_reports_failures_per_item(self):
+        accounts = [self.data.random_account() for _ in xrange(5)]
+        duplicate = accounts[0]
+        batch = BatchExecutor(max_concurrency=4)
+        batch.submit_all(self.account_api, 'create', accounts)
+        report = batch.report()
+        assert report.ok, "batch creation failed: %s" % report.failed
+        batch.create(self.account_api, duplicate)
+        report = batch.report()
+        assert len(report.succeeded) == len(accounts)
+        assert len(report.failed) == 1
+        assert report.failed[0].item is duplicate
+        assert isinstance(report.failed[0].error, CloudstackAPIException)
+
+    def test_delete_all_accounts_by_name(self):
+        accounts = [self.account_api.create(self.data.random_account(account_type=USER_ACC)) for _ in xrange(3)]
+        report = self.account_api.delete_all(*accounts)
+        assert report.ok, "deleting accounts failed: %s" % report.failed
+        assert len(report) == len(accounts)
+        for account in accounts:
+            with self.assertRaisesRegexp(CloudstackAPIException, 'found'):
+                self.account_api.find(name=account.name)
+
+    def test_cached_list_is_invalidated_by_create(self):
+        connections.register('cached', cacheTtl=60, credentialCache='')
+        try:
+            cached_api = AccountAPI('cached')
+            cache = cached_api.connection().result_cache
+            before = len(cached_api.list(listall=True))
+            self.assertEqual(before, len(cached_api.list(listall=True)))
+            self.assertEqual(1, cache.hits)
+            cached_api.create(self.data.random_account(account_type=USER_ACC))
+            self.assertEqual(before + 1, len(cached_api.list(listall=True)))
+            self.assertEqual(1, cache.hits)
+        finally:
+            connections.unregister('cached')
+
     def __confirm_account(self, account):
         """Confirms provided account exists by looking it up."""
         self.account_api.find(name=account.name)
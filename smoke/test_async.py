@@ -0,0 +1,69 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Basic tests of the non-blocking APIs.
+"""
+
+from cstest.framework import CITTestCase
+from csapi.apiclient import CloudstackAPIException
+from csapi.asyncapi import AsyncCSConnection, AsyncDomainAPI
+from csapi.commands import new_command
+from csapi.futures import wait_all
+from csapi.model import Domain
+
+
+class AsyncTestCase(CITTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super(AsyncTestCase, cls).setUpClass()
+        cls.async_domain_api = AsyncDomainAPI(connection=cls.connection)
+
+    def test_concurrent_domain_creation(self):
+        domains = [self.data.random_domain() for _ in xrange(5)]
+        futures = [self.async_domain_api.create(domain) for domain in domains]
+        wait_all(futures, timeout=60)
+        created = [future.result() for future in futures]
+        self.assertEqual(sorted([d.name for d in domains]), sorted([d.name for d in created]))
+        found = self.async_domain_api.find(name=domains[0].name).result(timeout=60)
+        self.assertIsInstance(found, Domain)
+        self.assertEqual(domains[0].name, found.name)
+
+    def test_find_failure_is_raised_from_result(self):
+        future = self.async_domain_api.find(name=self.data.random_string_id())
+        with self.assertRaisesRegexp(CloudstackAPIException, 'found'):
+            future.result(timeout=60)
+
+    def test_iter_list_pages_through_all_domains(self):
+        for future in [self.async_domain_api.create(self.data.random_domain()) for _ in xrange(3)]:
+            future.result(timeout=60)
+        listed = [d.id for d in self.domain_api.list(listall=True)]
+        pages = [page.result(timeout=60) for page in self.async_domain_api.iter_list(pagesize=2, listall=True)]
+        self.assertTrue(all([len(page) <= 2 for page in pages]))
+        self.assertEqual(sorted(listed), sorted([d.id for page in pages for d in page]))
+
+    def test_connection_commands_return_futures(self):
+        connection = AsyncCSConnection(credentialCache='')
+        cmd = new_command('listDomains')
+        cmd.listall = True
+        results = connection.listDomains(cmd).result(timeout=60)
+        self.assertTrue(len(results) > 0)
+
+
+if __name__ == '__main__':
+    from unittest import main
+    main()
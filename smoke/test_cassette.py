@@ -0,0 +1,91 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Tests of recording a session against the fake management server and replaying it.
+"""
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from cstest.fakeserver import FakeManagementServer
+from cstest.random_data import RandomData
+from csapi.cassette import CassetteMissException, request_key, RECORD, REPLAY
+from csapi.connection import CSConnection
+from csapi.domain import DomainAPI
+
+# nothing listens on port 1, so a replay that reaches for the network fails
+_unreachable = 'http://127.0.0.1:1/client/api'
+
+
+class CassetteTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeManagementServer(admin_user='admin', admin_password='password').start()
+        cls.data = RandomData()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'session.json.gz')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def connect(self, mode, base_url):
+        return CSConnection(baseUrl=base_url, user='admin', password='password', credentialCache='',
+                            cassette=self.path, cassetteMode=mode)
+
+    def test_replay_answers_like_the_recording(self):
+        domain = self.data.random_domain()
+        recording = self.connect(RECORD, self.server.base_url)
+        domain_api = DomainAPI(recording)
+        self.assertEqual([], domain_api.list(name=domain.name))
+        created = domain_api.create(domain)
+        listed = [d.id for d in domain_api.list(name=domain.name)]
+        self.assertEqual([created.id], listed)
+        recording.transport.cassette.close()
+        recording.close()
+
+        replaying = self.connect(REPLAY, _unreachable)
+        domain_api = DomainAPI(replaying)
+        # identical requests get their recorded responses in order
+        self.assertEqual([], domain_api.list(name=domain.name))
+        self.assertEqual(created.id, domain_api.create(domain).id)
+        self.assertEqual(listed, [d.id for d in domain_api.list(name=domain.name)])
+
+        with self.assertRaisesRegexp(CassetteMissException, 'no recorded response'):
+            replaying.transport.request('GET', _unreachable, params=dict(command='listZones', response='json'))
+        replaying.close()
+
+    def test_request_key_ignores_volatile_parameters(self):
+        key = request_key('get', {'command': 'listDomains', 'name': u'd', 'apiKey': 'a', 'signature': 's1',
+                                  'sessionkey': 'k1'})
+        self.assertEqual(key, request_key('GET', {'Name': 'd', 'command': 'listDomains', 'signature': 's2',
+                                                  'startdate': '2014-01-01 00:00:00'}))
+        self.assertNotEqual(key, request_key('POST', {'command': 'listDomains', 'name': 'd'}))
+        self.assertNotEqual(key, request_key('GET', {'command': 'listDomains', 'name': 'e'}))
+
+
+if __name__ == '__main__':
+    from unittest import main
+    main()
@@ -0,0 +1,115 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Tests of the api key cache, against the fake management server.
+"""
+
+import os
+import stat
+import shutil
+import tempfile
+from unittest import TestCase
+
+from cstest.fakeserver import FakeManagementServer
+from csapi.connection import CSConnection
+from csapi.credentials import CredentialCache
+from csapi.domain import DomainAPI
+
+
+class CredentialCacheTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeManagementServer(admin_user='admin', admin_password='password').start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cstest', 'credentials.json')
+        self.cache = CredentialCache(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def connect(self):
+        return CSConnection(baseUrl=self.server.base_url, user='admin', password='password',
+                            credentialCache=self.path)
+
+    def admin_keys(self):
+        admin = self.server.state.admin_user
+        return admin['apikey'], admin['secretkey']
+
+    def test_discovered_keys_are_cached(self):
+        self.connect().close()
+        self.assertEqual(self.admin_keys(), self.cache.get(self.server.base_url, 'admin', None))
+
+        logins = len(self.server.state.sessions)
+        connection = self.connect()
+        self.assertEqual(logins, len(self.server.state.sessions))
+        self.assertEqual(self.admin_keys()[0], connection.apiKey)
+        connection.close()
+
+    def test_rejected_keys_are_replaced(self):
+        self.cache.put(self.server.base_url, 'admin', None, 'stale-api-key', 'stale-secret-key')
+        connection = self.connect()
+        self.assertEqual('stale-api-key', connection.apiKey)
+        # the server answers 401, after which the keys are discovered and the request sent again
+        self.assertEqual(['ROOT'], [d.name for d in DomainAPI(connection).list(name='ROOT')])
+        self.assertEqual(self.admin_keys(), self.cache.get(self.server.base_url, 'admin', None))
+        connection.close()
+
+    def test_cache_is_private(self):
+        self.cache.put('http://localhost:8080/client/api', 'admin', None, 'api-key', 'secret-key')
+        self.assertEqual(0600, stat.S_IMODE(os.stat(self.path).st_mode))
+        self.assertEqual(0700, stat.S_IMODE(os.stat(os.path.dirname(self.path)).st_mode))
+        self.assertEqual(('api-key', 'secret-key'), self.cache.get('http://localhost:8080/client/api', 'admin', None))
+
+        os.chmod(self.path, 0644)
+        self.assertEqual((None, None), self.cache.get('http://localhost:8080/client/api', 'admin', None))
+
+    def test_invalidate_only_drops_one_entry(self):
+        self.cache.put('http://a/client/api', 'admin', None, 'a-key', 'a-secret')
+        self.cache.put('http://b/client/api', 'admin', 'sub', 'b-key', 'b-secret')
+        self.cache.invalidate('http://a/client/api', 'admin', None)
+        self.assertEqual((None, None), self.cache.get('http://a/client/api', 'admin', None))
+        self.assertEqual(('b-key', 'b-secret'), self.cache.get('http://b/client/api', 'admin', 'sub'))
+
+    def test_relative_path_is_in_working_directory(self):
+        cwd = os.getcwd()
+        os.chdir(self.directory)
+        try:
+            cache = CredentialCache('credentials.json')
+            cache.put('http://a/client/api', 'admin', None, 'a-key', 'a-secret')
+            self.assertEqual(('a-key', 'a-secret'), cache.get('http://a/client/api', 'admin', None))
+            self.assertTrue(os.path.isfile(os.path.join(self.directory, 'credentials.json')))
+        finally:
+            os.chdir(cwd)
+
+    def test_unwritable_cache_is_ignored(self):
+        # a file where the cache directory should be
+        open(os.path.dirname(self.path), 'w').close()
+        self.cache.put('http://a/client/api', 'admin', None, 'a-key', 'a-secret')
+        self.assertEqual((None, None), self.cache.get('http://a/client/api', 'admin', None))
+        self.cache.invalidate('http://a/client/api', 'admin', None)
+
+
+if __name__ == '__main__':
+    from unittest import main
+    main()
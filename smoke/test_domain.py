@@ -50,6 +50,49 @@ class DomainTestCase(CITTestCase):
         assert found_domain.haschild == True, \
             "adding child to domain should set its haschild to True"
 
+    def test_find_refreshes_the_created_domain(self):
+        created_domain = self.domain_api.create(self.data.random_domain())
+        child_domain = self.data.random_domain()
+        child_domain.parentdomainid = created_domain.id
+        self.domain_api.create(child_domain)
+        found_domain = self.domain_api.find(name=created_domain.name)
+        self.assertIs(created_domain, found_domain)
+        self.assertTrue(created_domain.haschild)
+
+    def test_create_many_creates_parents_before_children(self):
+        parent = self.data.random_domain()
+        children = [self.data.random_domain() for _ in xrange(3)]
+        for child in children:
+            child.parentdomainid = parent
+        results = list(self.domain_api.create_many([parent] + children, max_concurrency=4))
+        self.assertEqual([], [r for r in results if not r.succeeded])
+        created = [r.result for r in results]
+        self.assertEqual(4, len(created))
+        created_parent = [d for d in created if d.name == parent.name][0]
+        for domain in created:
+            self.__verify_domain(domain)
+            if domain is not created_parent:
+                self.assertEqual(created_parent.id, domain.parentdomainid)
+
+    def test_create_many_reports_failures_per_domain(self):
+        parent = self.data.random_domain()
+        parent.name = parent.name + "padding" * 1024
+        child = self.data.random_domain()
+        child.parentdomainid = parent
+        other = self.data.random_domain()
+        results = dict([(id(r.item), r) for r in self.domain_api.create_many([parent, child, other])])
+        self.assertFalse(results[id(parent)].succeeded)
+        self.assertFalse(results[id(child)].succeeded)
+        self.assertTrue(results[id(other)].succeeded)
+        self.__verify_domain(results[id(other)].result)
+
+    def test_iter_list_pages_through_all_domains(self):
+        for i in xrange(3):
+            self.domain_api.create(self.data.random_domain())
+        listed = [d.id for d in self.domain_api.list(listall=True)]
+        paged = [d.id for d in self.domain_api.iter_list(pagesize=2, listall=True)]
+        self.assertEqual(sorted(listed), sorted(paged))
+
     @failing
     def test_cannot_move_domain_after_creation_error(self):
         # parentdomainid is silently ignored on update!
@@ -95,6 +138,36 @@ class DomainTestCase(CITTestCase):
         domain = self.domain_api.create(domain)
         self.domain_api.update(domain)
 
+    def test_update_domain_sends_only_changes(self):
+        domain = self.domain_api.create(self.data.random_domain())
+        calls = self.connection.metrics.to_dict().get('updateDomain', {}).get('calls', 0)
+        self.assertIs(domain, self.domain_api.update(domain))
+        self.assertEqual(calls, self.connection.metrics.to_dict().get('updateDomain', {}).get('calls', 0))
+        domain.networkdomain = 'foo.bar'
+        self.assertEqual({'networkdomain': 'foo.bar'}, domain.changes())
+        self.assertEqual('foo.bar', self.domain_api.update(domain).networkdomain)
+        self.assertEqual({}, domain.changes())
+
+    def test_update_domain_after_find_sends_the_edit(self):
+        domain = self.data.random_domain()
+        domain.networkdomain = 'bar.baz'
+        self.assert_update_after_find_sends_the_edit(self.domain_api.create(domain))
+
+    def test_update_domain_without_network_domain_after_find_sends_the_edit(self):
+        # the server leaves networkdomain out of its responses while it is not set
+        domain = self.data.random_domain()
+        domain.networkdomain = None
+        self.assert_update_after_find_sends_the_edit(self.domain_api.create(domain))
+
+    def assert_update_after_find_sends_the_edit(self, domain):
+        domain.networkdomain = 'foo.bar'
+        self.assertIs(domain, self.domain_api.find(name=domain.name))
+        self.assertEqual({'networkdomain': 'foo.bar'}, domain.changes())
+        self.domain_api.update(domain)
+        self.assertEqual({}, domain.changes())
+        found_domain = self.domain_api.find(name=domain.name)
+        self.assertEqual('foo.bar', found_domain.networkdomain)
+
     def test_update_domain_with_conflicting_name(self):
         domain = self.domain_api.create(self.data.random_domain())
         other_domain = self.domain_api.create(self.data.random_domain())
@@ -0,0 +1,70 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Tests that run against their own fake management server, needing no cloudstack install.
+"""
+
+import os
+import sys
+import subprocess
+from unittest import TestCase
+
+from cstest.fakeserver import FakeManagementServer
+from cstest.random_data import RandomData
+from csapi.connection import CSConnection
+from csapi.domain import DomainAPI
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_smoke_modules = ['smoke.test_account', 'smoke.test_async', 'smoke.test_domain', 'smoke.test_user',
+                  'smoke.test_zone']
+
+
+class FakeServerTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeManagementServer(admin_user='admin', admin_password='password').start()
+        cls.data = RandomData()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def connect(self, **kwargs):
+        # nothing listens on port 1, so requests that ignore the base url fail
+        return CSConnection(baseUrl=self.server.base_url, host='127.0.0.1', port=1, user='admin',
+                            password='password', credentialCache='', **kwargs)
+
+    def test_api_requests_go_to_base_url(self):
+        domain_api = DomainAPI(self.connect())
+        domain = domain_api.create(self.data.random_domain())
+        self.assertIn(domain.id, self.server.state.domains)
+        self.assertEqual(domain.id, domain_api.find(name=domain.name).id)
+
+    def test_smoke_suite_passes_against_fake_server(self):
+        env = dict(os.environ)
+        env['CS_FAKE_SERVER'] = '1'
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [_root, env.get('PYTHONPATH')]))
+        process = subprocess.Popen([sys.executable, '-m', 'unittest'] + _smoke_modules, env=env,
+                                   stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        output = process.communicate()[0]
+        self.assertEqual(0, process.returncode, output)
+
+
+if __name__ == '__main__':
+    from unittest import main
+    main()
@@ -0,0 +1,64 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Tests of refreshing model objects through the identity map, needing no cloudstack install.
+"""
+
+from unittest import TestCase
+
+from csapi.apiclient import IdentityMap
+from csapi.model import Domain, Struct
+
+
+class IdentityMapTestCase(TestCase):
+    def setUp(self):
+        self.identity_map = IdentityMap()
+        # like the server, leave out the fields that are not set
+        self.domain = self.identity_map.load(Domain, Struct(id='d1', name='d1', path='ROOT/d1'))
+
+    def test_edit_of_field_left_out_of_result_survives_refresh(self):
+        self.domain.networkdomain = 'foo.bar'
+        refreshed = self.identity_map.load(Domain, Struct(id='d1', name='d1', path='ROOT/d1'))
+        self.assertIs(self.domain, refreshed)
+        self.assertEqual('foo.bar', refreshed.networkdomain)
+        self.assertEqual({'networkdomain': 'foo.bar'}, refreshed.changes())
+
+    def test_field_cleared_on_server_is_cleared_on_refresh(self):
+        self.identity_map.load(Domain, Struct(id='d1', name='d1', path='ROOT/d1', networkdomain='foo.bar'))
+        self.assertEqual('foo.bar', self.domain.networkdomain)
+        self.identity_map.load(Domain, Struct(id='d1', name='d1', path='ROOT/d1'))
+        self.assertIsNone(self.domain.networkdomain)
+        self.assertEqual({}, self.domain.changes())
+
+    def test_edit_is_kept_over_fetched_value(self):
+        self.domain.name = 'local'
+        self.identity_map.load(Domain, Struct(id='d1', name='remote', path='ROOT/remote'))
+        self.assertEqual('local', self.domain.name)
+        self.assertEqual('ROOT/remote', self.domain.path)
+        self.assertEqual({'name': 'local'}, self.domain.changes())
+
+    def test_response_to_update_replaces_edits(self):
+        self.domain.name = 'local'
+        self.identity_map.load(Domain, Struct(id='d1', name='remote', path='ROOT/remote'), keep_changes=False)
+        self.assertEqual('remote', self.domain.name)
+        self.assertEqual({}, self.domain.changes())
+
+
+if __name__ == '__main__':
+    from unittest import main
+    main()
@@ -0,0 +1,72 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Tests of request signing, needing no cloudstack install.
+"""
+
+from unittest import TestCase
+
+from cstest.fakeserver import expected_signature
+from csapi.apiclient import RequestSigner
+
+# the example from the cloudstack api documentation
+_api_key = 'plgWJfZK4gyS3mOMTVmjUVg-X-jlWlnfaUJ9GAbBbf9EdM-kAYMmAiLqzzq1ElZLYq_u38zCm0bewzGUdP66mg'
+_secret_key = 'VDaACYb0LV9eNjTetIOElcVQkvJck_J_QljX_FcHRj87ZKiy0z0ty0ZsYBkoXkY9b7eq1EhwJaw7FF3akA3KBQ'
+_signature = 'TTpdDq/7j/J58XCRHomKoQXEQds='
+
+
+class createThingCmd(object):
+    typeInfo = {'name': 'string', 'displayText': 'string', 'domainId': 'uuid', 'Zone': 'string'}
+
+
+class SignatureTestCase(TestCase):
+    def test_documented_signature(self):
+        payload = {'apiKey': _api_key, 'command': 'listUsers', 'response': 'json'}
+        self.assertEqual(_signature, RequestSigner().sign(payload, _secret_key))
+
+    def test_prepared_order_matches_server(self):
+        signer = RequestSigner()
+        signer.prepare('createThing', createThingCmd)
+        payload = {'apiKey': _api_key, 'command': 'createThing', 'response': 'json',
+                   'name': 'a name/with+odd&chars', 'displayText': u'caf\xe9 d\xe9j\xe0 vu', 'Zone': 'Z1',
+                   'domainId': 42}
+        expected = expected_signature(dict([(k, unicode(v).encode('utf-8')) for k, v in payload.iteritems()]),
+                                      _secret_key)
+        self.assertEqual(expected, signer.sign(payload, _secret_key))
+        # keyed macs are copied, signing again gives the same result
+        self.assertEqual(expected, signer.sign(payload, _secret_key))
+
+    def test_expanded_list_parameters_match_server(self):
+        signer = RequestSigner()
+        signer.prepare('createThing', createThingCmd)
+        payload = {'apiKey': _api_key, 'command': 'createThing', 'response': 'json', 'name': 'thing',
+                   'details[0].key': 'Color', 'details[0].value': 'Dark Blue'}
+        self.assertEqual(expected_signature(payload, _secret_key), signer.sign(payload, _secret_key))
+
+    def test_secret_keys_are_kept_apart(self):
+        signer = RequestSigner()
+        payload = {'apiKey': _api_key, 'command': 'listUsers', 'response': 'json'}
+        other = signer.sign(payload, 'another secret')
+        self.assertNotEqual(_signature, other)
+        self.assertEqual(_signature, signer.sign(payload, _secret_key))
+        self.assertEqual(other, signer.sign(payload, 'another secret'))
+
+
+if __name__ == '__main__':
+    from unittest import main
+    main()
@@ -0,0 +1,57 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Tests of the adaptive concurrency limit, needing no cloudstack install.
+"""
+
+from unittest import TestCase
+
+from csapi.throttle import Throttle, AIMDController
+
+
+class ThrottleTestCase(TestCase):
+    def setUp(self):
+        self.throttle = Throttle(controller=AIMDController(initial=8))
+        # settle on a usual latency, so that only the outcome decides
+        self.throttle.acquire()
+        self.throttle.release(0.01, 200)
+
+    def release(self, status_code=None, unreachable=False):
+        self.throttle.acquire()
+        limit = self.throttle.controller.limit
+        self.throttle.release(0.01, status_code, unreachable=unreachable)
+        return self.throttle.controller.limit - limit
+
+    def test_success_increases_limit(self):
+        self.assertGreater(self.release(200), 0)
+
+    def test_overload_decreases_limit(self):
+        self.assertLess(self.release(503), 0)
+
+    def test_unreachable_server_decreases_limit(self):
+        self.assertLess(self.release(unreachable=True), 0)
+
+    def test_slot_is_freed_after_error(self):
+        for i in xrange(20):
+            self.release(unreachable=True)
+        self.assertEqual(0, self.throttle.controller._in_flight)
+
+
+if __name__ == '__main__':
+    from unittest import main
+    main()
@@ -19,9 +19,10 @@
 Basic tests of user management.
 """
 
-from csapi.model import DOMAIN_ACC, ADMIN_ACC
+from csapi.model import DOMAIN_ACC, ADMIN_ACC, USER_ACC
 from cstest.framework import CITTestCase, failing
-from csapi.apiclient import CloudstackAPIException
+from csapi.apiclient import CloudstackAPIException, connections
+from csapi.user import UserAPI
 
 class UserTestCase(CITTestCase):
     @classmethod
@@ -43,6 +44,20 @@ class UserTestCase(CITTestCase):
         with self.assertRaisesRegexp(CloudstackAPIException, 'exists'):
             self.user_api.create(user)
 
+    def test_named_connection_per_tenant(self):
+        account = self.data.random_account(account_type=USER_ACC)
+        self.account_api.create(account)
+        name = 'tenant-' + account.username
+        connections.register(name, user=account.username, password=account.password, credentialCache='')
+        try:
+            tenant_api = UserAPI(name)
+            self.assertEqual(account.username, tenant_api.find(username=account.username).username)
+            self.assertIsNot(self.user_api.connection(), tenant_api.connection())
+            with connections.using(name):
+                self.assertIs(tenant_api.connection(), self.user_api.connection())
+        finally:
+            connections.unregister(name)
+
     def test_same_username_in_different_accounts_same_domain_error(self):
         account1 = self.account_api.create(self.data.random_account(account_type=ADMIN_ACC))
         account2 = self.account_api.create(self.data.random_account(account_type=ADMIN_ACC))
@@ -89,6 +104,13 @@ class UserTestCase(CITTestCase):
         user.domainid = None
         assert domain.id == user.domainid, "User in account gets same domain as that account by default"
 
+    def test_stream_users_matches_list(self):
+        self.user_api.create(self.data.random_user(account=self.user_account))
+        listed = self.user_api.list(listall=True)
+        streamed = list(self.user_api.stream(listall=True))
+        assert [u.id for u in streamed] == [u.id for u in listed]
+        assert [u.username for u in streamed] == [u.username for u in listed]
+
     def __confirm_user(self, user):
         """Confirms provided user exists by looking it up."""
         self.user_api.find(username=user.username)
@@ -49,6 +49,15 @@ class ZoneTestCase(CITTestCase):
         zone = self.zone_api.create(zone)
         self.zone_api.update(zone)
 
+    def test_zone_creation_is_measured(self):
+        calls = self.connection.metrics.to_dict().get('createZone', {}).get('calls', 0)
+        self.zone_api.create(self.data.random_zone())
+        metrics = self.connection.metrics.to_dict()['createZone']
+        self.assertEqual(calls + 1, metrics['calls'])
+        self.assertTrue(metrics['network']['count'] > 0)
+        self.assertTrue(metrics['response_bytes'] > 0)
+        self.assertTrue(self.connection.metrics.percentile('createZone', 99) > 0)
+
     def test_delete_zone(self):
         zone = self.zone_api.create(self.data.random_zone())
         self.zone_api.delete(zone)